@@ -10,6 +10,7 @@ from pycommon.authz import validated, setup_validated, add_api_access_types
 from schemata.schema_validation_rules import rules
 from schemata.permissions import get_permission_checker
 from pycommon.const import APIAccessType
+from service.core import ASSISTANT_ACCESS_TYPES
 setup_validated(rules, get_permission_checker)
 add_api_access_types([APIAccessType.ASSISTANTS.value])
 
@@ -151,7 +152,7 @@ add_api_access_types([APIAccessType.ASSISTANTS.value])
 @validated(op="chat")
 def chat_with_code_interpreter(event, context, current_user, name, data):
     access = data["allowed_access"]
-    if APIAccessType.ASSISTANTS.value not in access and APIAccessType.FULL_ACCESS.value not in access:
+    if ASSISTANT_ACCESS_TYPES.isdisjoint(access):
         return {
             "success": False,
             "message": "API key does not have access to assistant functionality",
@@ -2,43 +2,94 @@ import base64
 from enum import Enum
 import json
 import math
+import mimetypes
 import uuid
 import time
-from functools import reduce
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from io import BytesIO
 import boto3
 import botocore
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from botocore.exceptions import ClientError, NoCredentialsError
 from pycommon.api.secrets import get_secret_value
 from pycommon.api.credentials import get_endpoint
 import os
+import httpx
 from openai import OpenAI
 from openai import AzureOpenAI
+from openai import DefaultHttpxClient
 from datetime import datetime, timezone
-from .token import count_tokens
-from PIL import Image
+from .token import count_tokens, count_tokens_batch
 
 
 openai_provider = os.environ["ASSISTANTS_OPENAI_PROVIDER"]
-dynamodb = boto3.resource("dynamodb")
+# one resource for the container, sized for the thread pools that share it.
+# keep-alive stops idle pooled sockets in warm containers from being dropped and re-handshaked
+dynamodb = boto3.resource(
+    "dynamodb",
+    config=Config(
+        max_pool_connections=32,
+        retries={"mode": "adaptive", "max_attempts": 5},
+        tcp_keepalive=True,
+        connect_timeout=2,
+    ),
+)
 s3 = boto3.client("s3")
 
+threads_table = dynamodb.Table(os.environ["ASSISTANT_THREADS_DYNAMODB_TABLE"])
+runs_table = dynamodb.Table(os.environ["ASSISTANT_THREAD_RUNS_DYNAMODB_TABLE"])
+assistants_table = dynamodb.Table(
+    os.environ["ASSISTANT_CODE_INTERPRETER_DYNAMODB_TABLE"]
+)
+usage_table = dynamodb.Table(os.environ["BILLING_DYNAMODB_TABLE"])
+# low level client on the same connection pool, for hot single key lookups
+dynamodb_client = dynamodb.meta.client
+
+files_bucket_name = os.environ["ASSISTANTS_FILES_BUCKET_NAME"]
+images_bucket_name = os.environ["S3_IMAGE_INPUT_BUCKET_NAME"]
+code_interpreter_files_bucket_name = os.environ[
+    "ASSISTANTS_CODE_INTERPRETER_FILES_BUCKET_NAME"
+]
+
 model = "gpt-4o"
 tools = [{"type": "code_interpreter"}]
 
+MULTIPART_UPLOAD_THRESHOLD = 8 * 1024 * 1024  # 8MB
+s3_transfer_config = TransferConfig(
+    multipart_threshold=MULTIPART_UPLOAD_THRESHOLD,
+    multipart_chunksize=MULTIPART_UPLOAD_THRESHOLD,
+    max_concurrency=8,
+    use_threads=True,
+)
+
 
 def get(dictionary, *keys):
-    return reduce(
-        lambda d, key: d.get(key, None) if isinstance(d, dict) else None,
-        keys,
-        dictionary,
+    value = dictionary
+    for key in keys:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+# the secret lookup is a network call, so build the client once per container
+# httpx drops idle connections after 5s by default, which is shorter than the gap between
+# most requests to a warm container, so idle connections are kept long enough to be reused
+openai_http_client = DefaultHttpxClient(
+    limits=httpx.Limits(
+        max_connections=32, max_keepalive_connections=16, keepalive_expiry=60
     )
+)
 
 
+@lru_cache(maxsize=1)
 def get_openai_client():
     if openai_provider == "openai":
         openai_api_key = get_secret_value("OPENAI_API_KEY")
-        client = OpenAI(api_key=openai_api_key)
+        client = OpenAI(api_key=openai_api_key, http_client=openai_http_client)
         return client
     elif openai_provider == "azure":
         azure_endpoint, azure_api_key = get_endpoint(
@@ -48,6 +99,7 @@ def get_openai_client():
             api_key=azure_api_key,
             api_version="2024-05-01-preview",
             azure_endpoint=azure_endpoint,
+            http_client=openai_http_client,
         )
         return client
     return None
@@ -57,95 +109,137 @@ def get_openai_client():
 client = get_openai_client()
 
 
+# opens the DynamoDB and OpenAI connections while the container initializes so the first
+# request finds them in the pool, any response (even an error) leaves the connection warm
+def prewarm_connections():
+    try:
+        # a get_item on a key that never exists, the role is granted reads on the threads table
+        dynamodb_client.get_item(
+            TableName=threads_table.name, Key={"id": {"S": "prewarm"}}
+        )
+    except Exception:
+        pass
+    try:
+        if client:
+            openai_http_client.head(str(client.base_url))
+    except Exception:
+        pass
+
+
+threading.Thread(target=prewarm_connections, daemon=True).start()
+
+
 def file_keys_to_file_ids(file_keys):
+    return [file_id for file_id in transfer_files_to_openai(file_keys) if file_id]
+
+
+# returns one entry per file key, None where the key was skipped or the transfer failed
+def transfer_files_to_openai(file_keys):
     if len(file_keys) == 0:
         return []
 
-    files_bucket_name = os.environ["ASSISTANTS_FILES_BUCKET_NAME"]
-    images_bucket_name = os.environ["S3_IMAGE_INPUT_BUCKET_NAME"]
-
     updated_keys = []
     for file_key in file_keys:
         file_key_user = file_key.split("//")[1] if ("//" in file_key) else file_key
         if "@" not in file_key_user or len(file_key_user) <= 6:
             print(f"Skipping {file_key}: doesn't look valid.")
+            updated_keys.append(None)
             continue
         updated_keys.append(file_key_user)
 
-    file_ids = []
-    for file_key in updated_keys:
-        file_stream = None
+    valid_key_count = len(updated_keys) - updated_keys.count(None)
+    if valid_key_count == 0:
+        return updated_keys
+
+    # each transfer is an S3 download followed by an OpenAI upload, both network bound,
+    # so run them concurrently; map keeps the file ids in the same order as the keys
+    with ThreadPoolExecutor(max_workers=min(10, valid_key_count)) as executor:
+        return list(
+            executor.map(
+                lambda file_key: file_key and transfer_file_to_openai(file_key),
+                updated_keys,
+            )
+        )
+
+
+def transfer_file_to_openai(file_key):
+    file_content = None
 
-        # if in files bucket
+    # if in files bucket
+    try:
+        # get_object raises the same ClientError as head_object when the key is missing
+        s3_obj = s3.get_object(Bucket=files_bucket_name, Key=file_key)
+        print(f"[FOUND] Key '{file_key}' is in the files bucket.")
+        print(
+            "Downloading file: {}/{} to transfer to OpenAI".format(
+                files_bucket_name, file_key
+            )
+        )
+        # read into bytes, the openai client retries failed uploads and an s3 body can't be rewound
+        with s3_obj["Body"] as body:
+            file_content = body.read()
+
+    except botocore.exceptions.ClientError as e:
+        print(
+            f"[NOT FOUND] Key '{file_key}' not in files bucket. Checking images bucket."
+        )
+
+    # check if in image bucket
+    if file_content is None:
         try:
-            s3.head_object(Bucket=files_bucket_name, Key=file_key_user)
-            print(f"[FOUND] Key '{file_key_user}' is in the files bucket.")
             print(
-                "Downloading file: {}/{} to transfer to OpenAI".format(
-                    files_bucket_name, file_key
-                )
+                f"[DOWNLOAD] Fetching base64 image from: {images_bucket_name}/{file_key}"
             )
-            # Use a BytesIO buffer to download the file directly into memory
-            file_stream = BytesIO()
-            s3.download_fileobj(files_bucket_name, file_key, file_stream)
-            file_stream.seek(0)  # Move to the beginning of the file-like object
+            s3_obj = s3.get_object(Bucket=images_bucket_name, Key=file_key)
+            print(f"[FOUND] Key '{file_key}' is in the images bucket.")
+            # images are stored base64 encoded, so these have to be decoded in memory
+            with s3_obj["Body"] as body:
+                base64_data = body.read().decode("utf-8")
+            file_content = base64.b64decode(base64_data)
 
         except botocore.exceptions.ClientError as e:
             print(
-                f"[NOT FOUND] Key '{file_key_user}' not in files bucket. Checking images bucket."
+                f"[ERROR] Could not confirm existence in both files and images bucket for key '{file_key}': {e}"
             )
+            return None
 
-        # check if in image bucket
-        if not file_stream:
-            try:
-                s3.head_object(Bucket=images_bucket_name, Key=file_key_user)
-                print(f"[FOUND] Key '{file_key_user}' is in the images bucket.")
-
-                print(
-                    f"[DOWNLOAD] Fetching base64 image from: {images_bucket_name}/{file_key_user}"
-                )
-                s3_obj = s3.get_object(Bucket=images_bucket_name, Key=file_key_user)
-                base64_data = s3_obj["Body"].read().decode("utf-8")
-                file_bytes = base64.b64decode(base64_data)
-                file_stream = BytesIO(file_bytes)
-
-            except botocore.exceptions.ClientError as e:
-                print(
-                    f"[ERROR] Could not confirm existence in both files and images bucket for key '{file_key_user}': {e}"
-                )
-                continue
-        # safely check
-        if file_stream:
-            print("Uploading file to OpenAI: {}".format(file_key))
-            # Create the file on OpenAI using the downloaded data
-            response = client.files.create(file=file_stream, purpose="assistants")
-
-            print("Response: {}".format(response))
-            file_id = response.id
-            if file_id:
-                file_ids.append(file_id)
-
-            file_stream.close()
+    print("Uploading file to OpenAI: {}".format(file_key))
+    # Create the file on OpenAI using the downloaded data
+    response = client.files.create(
+        file=(os.path.basename(file_key), file_content), purpose="assistants"
+    )
 
-    return file_ids
+    print("Uploaded file id: {}".format(response.id))
+    return response.id
 
 
 def send_file_to_s3(
     file_content, file_key, file_name, user_id, content_type="binary/octet-stream"
 ):
     print("Sending files to s3")
-    bucket_name = os.environ["ASSISTANTS_CODE_INTERPRETER_FILES_BUCKET_NAME"]
+    bucket_name = code_interpreter_files_bucket_name
 
     try:
-        print("Transfer file to s3 bucket: ".format(bucket_name))
-        file_stream = BytesIO(file_content)
-        print("File Stream: ", file_stream)
-        s3.upload_fileobj(
-            file_stream,
-            bucket_name,
-            file_key,
-            ExtraArgs={"ACL": "private", "ContentType": content_type},
-        )
+        print("Transfer file to s3 bucket: {}".format(bucket_name))
+        if len(file_content) > MULTIPART_UPLOAD_THRESHOLD:
+            # large outputs go through the transfer manager so the parts upload in parallel
+            with BytesIO(file_content) as file_stream:
+                s3.upload_fileobj(
+                    file_stream,
+                    bucket_name,
+                    file_key,
+                    ExtraArgs={"ACL": "private", "ContentType": content_type},
+                    Config=s3_transfer_config,
+                )
+        else:
+            # the content is already in memory, a single put avoids the transfer manager overhead
+            s3.put_object(
+                Bucket=bucket_name,
+                Key=file_key,
+                Body=file_content,
+                ACL="private",
+                ContentType=content_type,
+            )
 
         print(f"File uploaded to S3 bucket '{bucket_name}' with key '{file_key}'")
 
@@ -163,28 +257,33 @@ def send_file_to_s3(
     except Exception as e:
         # Handle other possible exceptions
         print(f"An unexpected error occurred: {e}")
-    finally:
-        file_stream.close()
 
 
 def create_low_res_version(file):
+    # imported here so cold starts that never resize an image skip loading Pillow
+    from PIL import Image
+
     print("Creating lower resolution version of image")
     image = Image.open(BytesIO(file.content))
-    original_width, original_height = image.size
+    image_format = image.format  # keep the original encoding, the upload keeps its content type
     target_size_bytes = 204800  # 200KB
     max_width, max_height = 800, 600  # Initial max dimensions
 
+    # one buffer is reused for every encode attempt, truncating keeps its allocation
+    resized_bytes = BytesIO()
     try:
         while True:
-            # Calculate the target size while maintaining aspect ratio
-            ratio = min(max_width / original_width, max_height / original_height)
-            target_size = (int(original_width * ratio), int(original_height * ratio))
-
-            resized_image = image.resize(target_size, Image.LANCZOS)
+            # thumbnail resizes in place and keeps the aspect ratio, so every retry
+            # resamples the already reduced image instead of the full resolution original.
+            # reducing_gap box-reduces large sources by an integer factor before LANCZOS. 1.5 is
+            # below pillow's default of 2.0, so the box pass goes further and LANCZOS convolves
+            # fewer pixels. that costs a little sharpness, which a low res preview can spare
+            image.thumbnail((max_width, max_height), Image.LANCZOS, reducing_gap=1.5)
 
             # Save the resized image to a bytes buffer
-            resized_bytes = BytesIO()
-            resized_image.save(resized_bytes, format=image.format)
+            resized_bytes.seek(0)
+            resized_bytes.truncate()
+            image.save(resized_bytes, format=image_format, optimize=True)
             resized_size = resized_bytes.tell()  # Get the resized image size
 
             # Check if the resized image meets the size criteria
@@ -195,9 +294,9 @@ def create_low_res_version(file):
             size_ratio = resized_size / target_size_bytes
             scale_factor = math.sqrt(size_ratio)
 
-            # Adjust max_width and max_height based on scale factor for the next attempt
-            max_width = int(max_width / scale_factor)
-            max_height = int(max_height / scale_factor)
+            # Shrink the current dimensions based on scale factor for the next attempt
+            max_width = int(image.width / scale_factor)
+            max_height = int(image.height / scale_factor)
 
             # Ensure the loop can exit if max dimensions become too small
             if max_width < 100 or max_height < 100:
@@ -212,22 +311,24 @@ def create_low_res_version(file):
         resized_bytes.close()
 
 
+CONTENT_TYPES_BY_EXTENSION = {
+    "csv": "text/csv",
+    "pdf": "application/pdf",
+    "png": "image/png",
+}
+
+
 def determine_content_type(file_name):
     print("Determining file type of: ", file_name)
-    extension = file_name.split(".")[-1]
-    if extension == "csv":
-        return "text/csv"
-    elif extension == "pdf":
-        return "application/pdf"
-    elif extension == "png":
-        return "image/png"
-    else:
-        return "binary/octet-stream"
+    extension = file_name.rpartition(".")[2].lower()
+    content_type = CONTENT_TYPES_BY_EXTENSION.get(extension)
+    if content_type:
+        return content_type
+    return mimetypes.guess_type(file_name)[0] or "binary/octet-stream"
 
 
 def get_presigned_download_url(key, current_user, download_filename=None):
-    s3 = boto3.client("s3")
-    bucket_name = os.environ["ASSISTANTS_CODE_INTERPRETER_FILES_BUCKET_NAME"]
+    bucket_name = code_interpreter_files_bucket_name
 
     print(f"Getting presigned download URL for {key} for user {current_user}")
     if not (current_user in key):
@@ -328,16 +429,34 @@ def chat_with_code_interpreter(
     return chat(current_user, provider_assistant_id, info)
 
 
+# the assistants api accepts up to 32 messages when creating a thread
+MAX_THREAD_CREATE_MESSAGES = 32
+
+# thread id -> time it was last verified, lets warm containers skip the retrieve call
+verified_threads = {}
+THREAD_VERIFICATION_TTL = 3600
+MAX_VERIFIED_THREADS = 1024
+
+
 def check_last_known_thread(info):
     thread_id = info["thread_id"]
     if not thread_id:
         return {"success": False, "error": "Failed to check last known threads status."}
+    verified_at = verified_threads.get(thread_id)
+    if verified_at and time.time() - verified_at < THREAD_VERIFICATION_TTL:
+        print("Thread was verified recently, skipping retrieve. ThreadId: ", thread_id)
+        return {
+            "success": True,
+            "message": "Last known thread was recently verified as active.",
+        }
     print("Checking if the thread is still good. ThreadId: ", thread_id)
     timestamp = int(time.time() * 1000)
     try:
         thread_info = client.beta.threads.retrieve(thread_id)
-        print(thread_info)
         if thread_info.id:
+            if len(verified_threads) >= MAX_VERIFIED_THREADS:
+                verified_threads.clear()
+            verified_threads[thread_id] = time.time()
             op_details = {"type": "RETRIEVE_THREAD", "timestamp": timestamp}
             record_thread_usage(op_details, info)  # record when you activate the thread
             return {
@@ -353,7 +472,11 @@ def check_last_known_thread(info):
 
 def get_active_thread_id_amplify_chat(messages, info):
     print("Initiate getting active thread")
-    updated_info, new_messages_to_last_known = get_last_known_thread_id(messages, info)
+    last_known_thread = get_last_known_thread_id(messages, info)
+    if not last_known_thread["success"]:
+        return last_known_thread
+    updated_info = last_known_thread["info"]
+    new_messages_to_last_known = last_known_thread["messages"]
 
     sanitized_messages = sanitize_messages(new_messages_to_last_known)
 
@@ -373,52 +496,86 @@ def get_active_thread_id_amplify_chat(messages, info):
 
 def get_last_known_thread_id(messages, info):
     if len(messages) == 0:
-        return info, messages
+        return {"success": True, "info": info, "messages": messages}
 
     print("Retrieving last known thread and missing messages")
     # traverse backward to see if and when there is some codeiterpreter message data attached to the messages passed in
+    # keeping the latest message index of every thread used in the conversation, newest first
+    thread_indexes = {}
     for index in range(len(messages) - 1, -1, -1):
-        if (
-            messages[index]
-            .get("data", {})
-            .get("state", {})
-            .get("codeInterpreter", {})
-            .get("threadId")
-            is not None
-        ):
-            print(
-                "Message with code interpreter message data: ",
-                messages[index]["data"]["state"]["codeInterpreter"],
+        # resolve the nested lookup once per message and skip messages without a thread
+        code_interpreter_data = (
+            ((messages[index].get("data") or {}).get("state") or {}).get(
+                "codeInterpreter"
             )
-            # theres no way the very last message in the list can have codeInterpreter MessageData according to existing logic
-            # the list will always contain the new user prompt, so will always at the bare minimum get messages[-1] if code interpreter has been used at some point
-            thread_key = messages[index]["data"]["state"]["codeInterpreter"]["threadId"]
-            thread_info = get_thread(thread_key, info["current_user"])
-            if thread_info["success"]:
-                info["thread_key"] = thread_key
-                info["thread_id"] = thread_info["openai_thread_id"]
-                thread_info = check_last_known_thread(info)
-                if thread_info["success"]:
-                    return info, messages[index + 1 :]
-
-    return (
-        info,
-        messages,
-    )  # occurs when code interpreter hasnt been used in a conversation or thread id wasnt found, we need to create a new one
+            or {}
+        )
+        thread_key = code_interpreter_data.get("threadId")
+        if thread_key is None or thread_key in thread_indexes:
+            continue
+
+        print(
+            "Message with code interpreter message data: ",
+            code_interpreter_data,
+        )
+        thread_indexes[thread_key] = index
+
+    if not thread_indexes:
+        # occurs when code interpreter hasnt been used in a conversation, we need to create a new one
+        return {"success": True, "info": info, "messages": messages}
+
+    # theres no way the very last message in the list can have codeInterpreter MessageData according to existing logic
+    # the list will always contain the new user prompt, so will always at the bare minimum get messages[-1] if code interpreter has been used at some point
+    threads = get_threads(list(thread_indexes), info["current_user"])
+    if not threads["success"]:
+        return threads
+    openai_thread_ids = threads["data"]
+    for thread_key, index in thread_indexes.items():
+        openai_thread_id = openai_thread_ids.get(thread_key)
+        if not openai_thread_id:
+            continue
+        info["thread_key"] = thread_key
+        info["thread_id"] = openai_thread_id
+        thread_info = check_last_known_thread(info)
+        if thread_info["success"]:
+            return {"success": True, "info": info, "messages": messages[index + 1 :]}
+
+    # occurs when the thread ids werent found or are no longer active, we need to create a new one
+    return {"success": True, "info": info, "messages": messages}
 
 
 def create_new_thread_for_chat(messages, info):
     user_id = info["current_user"]
     print("Creating a new thread")
-    dynamodb = boto3.resource("dynamodb")
-    threads_table = dynamodb.Table(os.environ["ASSISTANT_THREADS_DYNAMODB_TABLE"])
     timestamp = int(time.time() * 1000)
     thread_key = f"{user_id}/thr/{str(uuid.uuid4())}"
 
     try:
         # Create a new thread using the OpenAI Client
         print("Creating OpenAI thread...")
-        thread_id = client.beta.threads.create().id
+        messages_to_send = group_thread_messages(messages) if messages else []
+        # the first messages are sent with the create call so they keep their order without a request each
+        seed_messages = messages_to_send[:MAX_THREAD_CREATE_MESSAGES]
+        try:
+            thread_id = client.beta.threads.create(
+                messages=[
+                    {
+                        "role": "user",
+                        "content": message["content"],
+                        "attachments": [
+                            {"file_id": file_id, "tools": tools}
+                            for file_id in message["file_ids"]
+                        ],
+                    }
+                    for message in seed_messages
+                ]
+            ).id
+        except Exception as e:
+            if not seed_messages:
+                raise
+            print("Failed to create thread with its messages, adding them one by one: ", e)
+            thread_id = client.beta.threads.create().id
+            seed_messages = []
 
         info["thread_id"] = thread_id
         info["thread_key"] = thread_key
@@ -426,8 +583,10 @@ def create_new_thread_for_chat(messages, info):
         record_thread_usage(op_details, info)  ## record when you create
 
         print(f"Created thread: {thread_id}")
-        if messages:
-            message_catch_up_on_thread(messages, info)
+        if seed_messages:
+            record_seeded_thread_messages(seed_messages, timestamp, info)
+        if len(messages_to_send) > len(seed_messages):
+            send_thread_messages(messages_to_send[len(seed_messages) :], info)
     except Exception as e:
         print(e)
         return {
@@ -453,11 +612,35 @@ def create_new_thread_for_chat(messages, info):
     }
 
 
+def record_seeded_thread_messages(seed_messages, timestamp, info):
+    try:
+        thread_messages = client.beta.threads.messages.list(
+            thread_id=info["thread_id"], order="asc", limit=len(seed_messages)
+        ).data
+        token_counts = count_tokens_batch(
+            [message["content"] for message in seed_messages]
+        )
+        record_thread_operations(
+            [
+                {
+                    "type": "ADD_MESSAGE",
+                    "timestamp": timestamp,
+                    "messageID": thread_message.id,
+                    "inputTokens": input_tokens,
+                }
+                for thread_message, input_tokens in zip(thread_messages, token_counts)
+            ],
+            info,
+        )
+    except Exception as e:
+        print("Failed to record messages added with the thread: ", e)
+
+
 def sanitize_messages(messages, amplify_messages=True):
     print("Entered sanitize_mssages")
     sanitized_messages = []
-    i = 0
-    while i < len(messages):
+    message_file_keys = []
+    for i in range(0, len(messages), 2):
         message = messages[i]
         content = f"user: {message['content']}"
         if i + 1 < len(
@@ -465,24 +648,28 @@ def sanitize_messages(messages, amplify_messages=True):
         ):  # doesnt support assistant messages so we need to few shot it
             content += f" | assistant: {messages[i+1]['content']}"
 
-        sanitized_message = {"role": "user", "content": content, "file_ids": []}
+        sanitized_messages.append({"role": "user", "content": content, "file_ids": []})
 
         if not amplify_messages:
-            sanitized_message["file_ids"] = file_keys_to_file_ids(
-                message["dataSourceIds"]
-            )
-        elif (
-            message.get("data")
-            and ("dataSources" in message["data"])
-            and (len(message["data"]["dataSources"]))
-        ):
-            file_ids = file_keys_to_file_ids(
+            message_file_keys.append(message["dataSourceIds"])
+        elif message.get("data") and message["data"].get("dataSources"):
+            message_file_keys.append(
                 [source["id"] for source in message["data"]["dataSources"]]
             )
-            sanitized_message["file_ids"] = file_ids
+        else:
+            message_file_keys.append([])
 
-        sanitized_messages.append(sanitized_message)
-        i += 2
+    # transfer the files of every message in one concurrent batch, then hand the ids back per message
+    all_file_ids = transfer_files_to_openai(
+        [file_key for file_keys in message_file_keys for file_key in file_keys]
+    )
+    start = 0
+    for sanitized_message, file_keys in zip(sanitized_messages, message_file_keys):
+        end = start + len(file_keys)
+        sanitized_message["file_ids"] = [
+            file_id for file_id in all_file_ids[start:end] if file_id
+        ]
+        start = end
     # print("Sanitized messages: ", sanitized_messages)
     return sanitized_messages
 
@@ -494,6 +681,11 @@ def message_catch_up_on_thread(missing_messages, info):
     if len(missing_messages) == 0:
         return {"success": False, "message": "No messages to add"}
     print("Get any missing messages on the thread")
+    return send_thread_messages(group_thread_messages(missing_messages), info)
+
+
+# merges consecutive messages into thread messages carrying at most 10 files each
+def group_thread_messages(missing_messages):
     messages_to_send = []
     current_content = ""
     current_file_ids = []
@@ -511,27 +703,15 @@ def message_catch_up_on_thread(missing_messages, info):
                 len(msg["file_ids"]) > 10
             ):  # for cases where a large sum of messages are added to one message
                 current_content = f"The following data sources are in regards to my prompt: {msg['content']}"
-                messages_to_send.append(
-                    {"content": current_content, "file_ids": msg["file_ids"][:10]}
-                )
-
-                current_file_ids = msg["file_ids"][10:]
-                while current_file_ids:
-                    if len(current_file_ids) > 10:
-                        messages_to_send.append(
-                            {
-                                "content": current_content,
-                                "file_ids": current_file_ids[:10],
-                            }
-                        )
-                        current_file_ids = current_file_ids[10:]
-                    else:  # so all sources pertaining to the same messages are together
-                        # even if there is only one message left over, it still goes with the message that it was attached to.
-                        messages_to_send.append(
-                            {"content": current_content, "file_ids": current_file_ids}
-                        )
-                        current_content = ""
-                        current_file_ids = []
+                # so all sources pertaining to the same messages are together, every chunk of 10
+                # carries the message even if there is only one source left over for the last one
+                file_ids = msg["file_ids"]
+                for start in range(0, len(file_ids), 10):
+                    messages_to_send.append(
+                        {"content": current_content, "file_ids": file_ids[start : start + 10]}
+                    )
+                current_content = ""
+                current_file_ids = []
             else:  # we can begin the new set of content and file ids
                 current_content = f"{msg['content']}"
                 current_file_ids = msg["file_ids"]
@@ -544,24 +724,44 @@ def message_catch_up_on_thread(missing_messages, info):
         messages_to_send.append(
             {"content": current_content, "file_ids": current_file_ids}
         )
+    return messages_to_send
+
 
+def send_thread_messages(messages_to_send, info):
     print("Total messages in to send list: ", len(messages_to_send))
+    added_operations = []
     try:
         print("Adding missing messages to thread.")
-        for message in messages_to_send:
-            content = message["content"]
-            add_message_to_thread(info, content, message["file_ids"])
+        token_counts = count_tokens_batch(
+            [message["content"] for message in messages_to_send]
+        )
+        for message, input_tokens in zip(messages_to_send, token_counts):
+            added_operations.append(
+                add_message_to_thread(
+                    info, message["content"], message["file_ids"], input_tokens
+                )
+            )
+    except Exception as e:
+        print(e)
 
-        return {
-            "success": True,
-            "message": "Successfully added missing messages to the thread.",
-        }
+    try:
+        # record every message added with one usage update instead of one per message
+        record_thread_operations(added_operations, info)
     except Exception as e:
         print(e)
-    return {"success": False, "error": "Failed to sync messages to the thread."}
+        return {"success": False, "error": "Failed to sync messages to the thread."}
 
+    if len(added_operations) < len(messages_to_send):
+        verified_threads.pop(info["thread_id"], None)
+        return {"success": False, "error": "Failed to sync messages to the thread."}
 
-def add_message_to_thread(info, content, file_ids):
+    return {
+        "success": True,
+        "message": "Successfully added missing messages to the thread.",
+    }
+
+
+def add_message_to_thread(info, content, file_ids, input_tokens):
     timestamp = int(time.time() * 1000)
 
     messageResponse = client.beta.threads.messages.create(
@@ -574,9 +774,9 @@ def add_message_to_thread(info, content, file_ids):
         "type": "ADD_MESSAGE",
         "timestamp": timestamp,
         "messageID": messageResponse.id,  # would cause an exception if raises a KeyError
-        "inputTokens": count_tokens(content),
+        "inputTokens": input_tokens,
     }
-    record_thread_usage(op_details, info)  # record every message added
+    return op_details  # recorded by the caller once all messages are added
 
 
 def chat(current_user, provider_assistant_id, info):
@@ -587,10 +787,12 @@ def chat(current_user, provider_assistant_id, info):
         run = client.beta.threads.runs.create(
             thread_id=openai_thread_id, assistant_id=provider_assistant_id
         )
-        print(f"Run created: {run}")
+        print(f"Run created: {run.id}")
 
-        tries = 28
-        while tries > 0:
+        # poll quickly at first since most runs finish within a few seconds, then back off
+        attempt = 0
+        deadline = time.time() + 28
+        while time.time() < deadline:
             print(f"Checking for the result of the run {run.id}")
             try:
                 status = client.beta.threads.runs.retrieve(
@@ -627,9 +829,12 @@ def chat(current_user, provider_assistant_id, info):
                 record_thread_run_data(run_data, "Failed", info)
                 return {"success": False, "error": "Failed to retrieve run status."}
 
-            time.sleep(1)
+            time.sleep(min(2.0, 0.25 * (1.5**attempt)))
+            attempt += 1
     except Exception as e:
         print(e)
+        # the thread may be gone, make the next request verify it again
+        verified_threads.pop(openai_thread_id, None)
         return {"success": False, "error": "Failed to run the assistant on the thread."}
 
     timestamp = int(time.time() * 1000)
@@ -640,7 +845,7 @@ def chat(current_user, provider_assistant_id, info):
 
     # assitant response message is the first in the data list
     assistantMessage = thread_messages.data[0]
-    print("Assistant Response Message: ", assistantMessage)
+    print("Assistant Response Message: ", assistantMessage.id)
 
     # make sure its the assistant response!
     if not assistantMessage.role == "assistant":
@@ -730,30 +935,47 @@ def chat(current_user, provider_assistant_id, info):
 def get_response_values(file, content_type, file_key, current_user, file_name=None):
     print("Get response Values")
     values = {}
-    presigned_url = send_file_to_s3(
-        file.content, file_key, file_name, current_user, content_type
-    )
-    file_size = get_file_size(file)
-    if presigned_url["success"]:
-        values["file_key"] = file_key
-        values["presigned_url"] = presigned_url["presigned_url"]
-        values["file_size"] = file_size
-
-    if ("png" in content_type) and (file_size > 204800):  # Greater than 200KB
-        print("File was too large!")
-        # Create a low-resplution version of the file
-        file_key_low_res = file_key + "-low-res"
-        low_res_file_content = create_low_res_version(file)
-        presigned_url_low_res = send_file_to_s3(
-            low_res_file_content,
-            file_key_low_res,
+    file_content = file.content
+    file_size = len(file_content)
+    create_low_res = ("png" in content_type) and (
+        file_size > 204800
+    )  # Greater than 200KB
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        # upload the full file while the low resolution version is being resized
+        full_upload = executor.submit(
+            send_file_to_s3,
+            file_content,
+            file_key,
             file_name,
             current_user,
             content_type,
         )
-        if presigned_url_low_res["success"]:
-            values["file_key_low_res"] = file_key_low_res
-            values["presigned_url_low_res"] = presigned_url["presigned_url"]
+
+        presigned_url_low_res = None
+        if create_low_res:
+            print("File was too large!")
+            # Create a low-resplution version of the file
+            file_key_low_res = file_key + "-low-res"
+            low_res_file_content = create_low_res_version(file)
+            presigned_url_low_res = send_file_to_s3(
+                low_res_file_content,
+                file_key_low_res,
+                file_name,
+                current_user,
+                content_type,
+            )
+
+        presigned_url = full_upload.result()
+
+    if presigned_url and presigned_url["success"]:
+        values["file_key"] = file_key
+        values["presigned_url"] = presigned_url["presigned_url"]
+        values["file_size"] = file_size
+
+    if presigned_url_low_res and presigned_url_low_res["success"]:
+        values["file_key_low_res"] = file_key_low_res
+        values["presigned_url_low_res"] = presigned_url_low_res["presigned_url"]
 
     if values:
         # print("Values for image key/presigned_url: ", values)
@@ -764,19 +986,8 @@ def get_response_values(file, content_type, file_key, current_user, file_name=No
     }
 
 
-def get_file_size(file):
-    with BytesIO(file.content) as file_bytes:
-        file_bytes.seek(0, 2)  # Move the pointer to the end of the file
-        file_size = (
-            file_bytes.tell()
-        )  # Get the current file position (which is the file size)
-    return file_size
-
-
 def record_thread_usage(op_details, info):
     print("Recording thread usage")
-    dynamodb = boto3.resource("dynamodb")
-    usage_table = dynamodb.Table(os.environ["BILLING_DYNAMODB_TABLE"])
 
     timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
 
@@ -791,6 +1002,8 @@ def record_thread_usage(op_details, info):
             "thread_id": info["thread_id"],
             "assistant_id": info["assistant_id"],
             "itemType": "codeInterpreter",
+            "lastSessionIndex": 0,
+            "lastSessionStart": op_details["timestamp"],
         }
         new_item = {
             "id": entry_key,
@@ -802,72 +1015,164 @@ def record_thread_usage(op_details, info):
             "requestId": info["request_id"],
         }
         usage_table.put_item(Item=new_item)
-        print("New Entry: ", usage_table.get_item(Key={"id": entry_key})["Item"])
+        print("New Entry id: ", entry_key)
 
         add_session_billing_table(timestamp, info)
 
     else:
-        response = usage_table.get_item(Key={"id": entry_key})
+        record_thread_operations([op_details], info)
+    print("Successfully recorded thread usage")
 
-        if "Item" not in response:
-            print("Failed to find record of thread usage!")
-            return
 
-        usage_item = response["Item"]
-        # Authorization check: the user making the request should own the assistant
-        if usage_item["user"] != current_user:
-            print("Not authorized to access this Thread Usage data")
-            return
-
-        details = get(usage_item, "details")
-        sessions = details.get("sessions", [])
-
-        if not sessions:  # just incase sessions get deleted on the backend or something
-            details = {
-                "sessions": [
-                    {"start_time": op_details["timestamp"], "operations": [op_details]}
-                ],
-                "thread_id": info["thread_id"],
-                "assistant_id": info["assistant_id"],
-            }
-            add_session_billing_table(timestamp, info)
+# appends operations to the thread usage sessions, only the position of the last session is read
+def record_thread_operations(operations, info):
+    if not operations:
+        return
 
-        else:
-            # Get the last session
-            last_session = sessions[-1]
-            session_start_time = last_session.get("start_time")
-            current_timestamp = op_details["timestamp"]
+    current_user = info["current_user"]
+    entry_key = f"{info['thread_key']}/{info['assistant_key']}"
 
-            # Compare the time difference between current operation and the initial session start
-            time_diff = current_timestamp - session_start_time
+    response = usage_table.get_item(
+        Key={"id": entry_key},
+        ProjectionExpression="#user, details.lastSessionIndex, details.lastSessionStart",
+        ExpressionAttributeNames={"#user": "user"},
+    )
 
-            if (
-                time_diff <= 3600000
-            ):  # Assuming time difference is in milliseconds and 3600000 ms = 1 hour
-                # If within an hour, add the current operation to the last session
-                last_session["operations"].append(op_details)
+    if "Item" not in response:
+        print("Failed to find record of thread usage!")
+        return
+
+    usage_item = response["Item"]
+    # Authorization check: the user making the request should own the assistant
+    if usage_item["user"] != current_user:
+        print("Not authorized to access this Thread Usage data")
+        return
+
+    last_index = get(usage_item, "details", "lastSessionIndex")
+    last_start = get(usage_item, "details", "lastSessionStart")
+    if last_index is None or last_start is None:
+        # entries written before the last session was tracked get one full rewrite
+        rewrite_thread_sessions(operations, info)
+        return
+    last_index = int(last_index)
+
+    last_session_operations = []
+    new_sessions = []
+    for op_details in operations:
+        session_start = new_sessions[-1]["start_time"] if new_sessions else last_start
+        # Assuming time difference is in milliseconds and 3600000 ms = 1 hour
+        if op_details["timestamp"] - session_start <= 3600000:
+            if new_sessions:
+                new_sessions[-1]["operations"].append(op_details)
             else:
-                # If not within an hour, create a new session
-                sessions.append(
-                    {"start_time": op_details["timestamp"], "operations": [op_details]}
-                )
-                add_session_billing_table(timestamp, info)
+                last_session_operations.append(op_details)
+        else:
+            new_sessions.append(
+                {"start_time": op_details["timestamp"], "operations": [op_details]}
+            )
 
-        # Update the DynamoDB item with the modified details
-        usage_table.update_item(
-            Key={"id": entry_key},
-            UpdateExpression="set details = :d",
-            ExpressionAttributeValues={":d": details},
-        )
-        print("Updated Entry: ", usage_table.get_item(Key={"id": entry_key})["Item"])
-    print("Successfully recorded thread usage")
+    pending_operations = operations
+    try:
+        if last_session_operations:
+            path = f"details.sessions[{last_index}].operations"
+            usage_table.update_item(
+                Key={"id": entry_key},
+                UpdateExpression=f"SET {path} = list_append({path}, :ops)",
+                ConditionExpression="details.lastSessionIndex = :index",
+                ExpressionAttributeValues={
+                    ":ops": last_session_operations,
+                    ":index": last_index,
+                },
+            )
+            pending_operations = [
+                op_details
+                for session in new_sessions
+                for op_details in session["operations"]
+            ]
+        if new_sessions:
+            usage_table.update_item(
+                Key={"id": entry_key},
+                UpdateExpression="SET details.sessions = list_append(details.sessions, :sessions), "
+                "details.lastSessionIndex = :next_index, "
+                "details.lastSessionStart = :start",
+                ConditionExpression="details.lastSessionIndex = :index",
+                ExpressionAttributeValues={
+                    ":sessions": new_sessions,
+                    ":next_index": last_index + len(new_sessions),
+                    ":start": new_sessions[-1]["start_time"],
+                    ":index": last_index,
+                },
+            )
+    except dynamodb_client.exceptions.ConditionalCheckFailedException:
+        # another request started a session in the meantime, rewrite from the latest state
+        print("Thread usage sessions changed concurrently, rewriting them")
+        rewrite_thread_sessions(pending_operations, info)
+        return
+
+    timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+    for _ in new_sessions:
+        add_session_billing_table(timestamp, info)
+    print("Updated Entry id: ", entry_key)
+
+
+# read-modify-write of the full sessions list, used for entries without a tracked last session
+def rewrite_thread_sessions(operations, info):
+    timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+    current_user = info["current_user"]
+    entry_key = f"{info['thread_key']}/{info['assistant_key']}"
+
+    response = usage_table.get_item(Key={"id": entry_key})
+
+    if "Item" not in response:
+        print("Failed to find record of thread usage!")
+        return
+
+    usage_item = response["Item"]
+    # Authorization check: the user making the request should own the assistant
+    if usage_item["user"] != current_user:
+        print("Not authorized to access this Thread Usage data")
+        return
+
+    details = get(usage_item, "details")
+    sessions = details.get("sessions", [])
+
+    if not sessions:  # just incase sessions get deleted on the backend or something
+        details = {
+            "sessions": sessions,
+            "thread_id": info["thread_id"],
+            "assistant_id": info["assistant_id"],
+        }
+
+    for op_details in operations:
+        # Compare the time difference between current operation and the last session start
+        if sessions and (
+            op_details["timestamp"] - sessions[-1].get("start_time") <= 3600000
+        ):  # Assuming time difference is in milliseconds and 3600000 ms = 1 hour
+            # If within an hour, add the current operation to the last session
+            sessions[-1]["operations"].append(op_details)
+        else:
+            # If not within an hour, create a new session
+            sessions.append(
+                {"start_time": op_details["timestamp"], "operations": [op_details]}
+            )
+            add_session_billing_table(timestamp, info)
+
+    details["lastSessionIndex"] = len(sessions) - 1
+    details["lastSessionStart"] = sessions[-1]["start_time"]
+
+    # Update the DynamoDB item with the modified details
+    usage_table.update_item(
+        Key={"id": entry_key},
+        UpdateExpression="set details = :d",
+        ExpressionAttributeValues={":d": details},
+    )
+    print("Updated Entry id: ", entry_key)
 
 
 def add_session_billing_table(timestamp, info):
     print("Recording session to billing")
-    dynamodb = boto3.resource("dynamodb")
-    billing_table = dynamodb.Table(os.environ["BILLING_DYNAMODB_TABLE"])
-    billing_table.put_item(
+    usage_table.put_item(
         Item={
             "id": f"{str(uuid.uuid4())}",
             "accountId": info["account_id"],
@@ -884,8 +1189,6 @@ def add_session_billing_table(timestamp, info):
 def record_thread_run_data(run_data, run_status, info):
     print("Adding run to dynamo table")
     user_id = info["current_user"]
-    dynamodb = boto3.resource("dynamodb")
-    runs_table = dynamodb.Table(os.environ["ASSISTANT_THREAD_RUNS_DYNAMODB_TABLE"])
     timestamp = int(time.time() * 1000)
     run_key = f"{user_id}/run/{str(uuid.uuid4())}"
 
@@ -905,24 +1208,60 @@ def record_thread_run_data(run_data, run_status, info):
     print("Successfully recorded run")
 
 
+# thread lookups only need the owner and the provider thread id, not the whole record.
+# thread and assistant records are written once, so their lookups stay eventually consistent
+THREAD_PROJECTION_NAMES = {"#user": "user", "#data": "data", "#provider": openai_provider}
+
+
+# direct lookups of the provider ids stored on thread and assistant records
+def provider_thread_id(item):
+    try:
+        return item["data"][openai_provider]["threadId"]
+    except (KeyError, TypeError):
+        return None
+
+
+def provider_assistant_id_of(item):
+    try:
+        return item["data"]["assistantId"]
+    except (KeyError, TypeError):
+        return None
+
+
+# thread and assistant keys are created as "<user>/thr/<uuid>" and "<user>/ast/<uuid>",
+# so a key without the caller's prefix cannot belong to them and needs no lookup
+def is_user_key(key, user_id, key_type):
+    return isinstance(key, str) and key.startswith(f"{user_id}/{key_type}/")
+
+
 def get_thread(thread_key, user_id):
-    dynamodb = boto3.resource("dynamodb")
-    threads_table = dynamodb.Table(os.environ["ASSISTANT_THREADS_DYNAMODB_TABLE"])
+    if not is_user_key(thread_key, user_id, "thr"):
+        return {"success": False, "error": "Not authorized to access this thread"}
 
     # Fetch the thread item from DynamoDB
     try:
-        response = threads_table.get_item(Key={"id": thread_key})
+        # the client returns the raw attribute values, skipping the resource's type conversion
+        response = dynamodb_client.get_item(
+            TableName=threads_table.name,
+            Key={"id": {"S": thread_key}},
+            ProjectionExpression="#user, #data.#provider.threadId",
+            ExpressionAttributeNames=THREAD_PROJECTION_NAMES,
+            ConsistentRead=False,
+        )
 
         if "Item" not in response:
             return {"success": False, "error": "Thread not found"}
 
         item = response["Item"]
         # Check user authorization
-        if item["user"] != user_id:
+        if item["user"]["S"] != user_id:
             return {"success": False, "error": "Not authorized to access this thread"}
 
         # Extract the OpenAI thread ID from the item
-        openai_thread_id = get(item, "data", openai_provider, "threadId")
+        try:
+            openai_thread_id = item["data"]["M"][openai_provider]["M"]["threadId"]["S"]
+        except KeyError:
+            openai_thread_id = None
 
         if not openai_thread_id:
             return {"success": False, "error": "Thread not found"}
@@ -939,38 +1278,99 @@ def get_thread(thread_key, user_id):
         return {"success": False, "error": str(e)}
 
 
+# looks up the openai thread ids of several threads with BatchGetItem, skipping threads the user doesnt own
+# data maps each of the user's existing thread keys to its openai thread id, a failed read is
+# reported as success False rather than an empty mapping so callers don't start over silently
+def get_threads(thread_keys, user_id):
+    openai_thread_ids = {}
+    thread_keys = [key for key in thread_keys if is_user_key(key, user_id, "thr")]
+    for start in range(0, len(thread_keys), 100):  # BatchGetItem takes up to 100 keys
+        keys = [{"id": key} for key in thread_keys[start : start + 100]]
+        request_items = {
+            threads_table.name: {
+                "Keys": keys,
+                "ProjectionExpression": "id, #user, #data.#provider.threadId",
+                "ExpressionAttributeNames": THREAD_PROJECTION_NAMES,
+                "ConsistentRead": False,
+            }
+        }
+        attempt = 0
+        while request_items:
+            try:
+                response = dynamodb.batch_get_item(RequestItems=request_items)
+            except ClientError as e:
+                print(f"Error reading threads: {e.response['Error']['Message']}")
+                return {"success": False, "error": "Failed to look up the conversation threads"}
+
+            for item in response["Responses"].get(threads_table.name, []):
+                if item["user"] != user_id:
+                    continue
+                openai_thread_id = provider_thread_id(item)
+                if openai_thread_id:
+                    openai_thread_ids[item["id"]] = openai_thread_id
+
+            request_items = response.get("UnprocessedKeys")
+            if request_items:
+                # unprocessed keys are throttled reads, back off before asking again
+                time.sleep(min(1.0, 0.05 * (2**attempt)))
+                attempt += 1
+    return {"success": True, "data": openai_thread_ids}
+
+
+# (assistant id, user) -> (time cached, result), a record's provider assistant id never changes
+cached_assistants = {}
+ASSISTANT_CACHE_TTL = 300
+MAX_CACHED_ASSISTANTS = 1024
+
+
 def get_assistant(assistant_id, current_user):
-    dynamodb = boto3.resource("dynamodb")
-    assistantstable = dynamodb.Table(
-        os.environ["ASSISTANT_CODE_INTERPRETER_DYNAMODB_TABLE"]
-    )
+    if not is_user_key(assistant_id, current_user, "ast"):
+        return {"success": False, "error": "Not authorized to access this assistant"}
+
+    cache_key = (assistant_id, current_user)
+    cached = cached_assistants.get(cache_key)
+    if cached and time.time() - cached[0] < ASSISTANT_CACHE_TTL:
+        return cached[1]
 
     try:
         # Fetch the assistant from DynamoDB
         print("Assistant key: ", assistant_id)
-        response = assistantstable.get_item(Key={"id": assistant_id})
+        response = dynamodb_client.get_item(
+            TableName=assistants_table.name,
+            Key={"id": {"S": assistant_id}},
+            ProjectionExpression="#user, #data.assistantId",
+            ExpressionAttributeNames={"#user": "user", "#data": "data"},
+            ConsistentRead=False,
+        )
 
         if "Item" not in response:
             return {"success": False, "error": "Assistant not found"}
 
         assistant_item = response["Item"]
         # Authorization check: the user making the request should own the assistant
-        if assistant_item["user"] != current_user:
+        if assistant_item["user"]["S"] != current_user:
             return {
                 "success": False,
                 "error": "Not authorized to access this assistant",
             }
 
         # Extract the OpenAI assistant ID from the item
-        provider_assistant_id = get(assistant_item, "data", "assistantId")
+        try:
+            provider_assistant_id = assistant_item["data"]["M"]["assistantId"]["S"]
+        except KeyError:
+            provider_assistant_id = None
 
         # If we have a valid OpenAI assistant ID, return the successful result
         if provider_assistant_id:
-            return {
+            result = {
                 "success": True,
                 "assistant_key": assistant_id,
                 "provider_assistant_id": provider_assistant_id,
             }
+            if len(cached_assistants) >= MAX_CACHED_ASSISTANTS:
+                cached_assistants.clear()
+            cached_assistants[cache_key] = (time.time(), result)
+            return result
         else:
             return {"success": False, "error": "Assistant not found"}
 
@@ -986,8 +1386,6 @@ def check_assistant_exists(assistant_id, current_user):
     if not assistant_info["success"]:
         return assistant_info  # Return error if any
 
-    print(f"Assistant info: {assistant_info}")
-
     provider_assistant_id = assistant_info["provider_assistant_id"]
 
     if not provider_assistant_id:
@@ -996,50 +1394,95 @@ def check_assistant_exists(assistant_id, current_user):
     return {"success": True, "provider_assistant_id": provider_assistant_id}
 
 
-def delete_thread_by_id(thread_id, user_id):
-    dynamodb = boto3.resource("dynamodb")
-    threads_table = dynamodb.Table(os.environ["ASSISTANT_THREADS_DYNAMODB_TABLE"])
+# deletes the row only when it belongs to the user, returning it so no separate read is needed
+def delete_owned_item(table, item_id, user_id):
+    try:
+        response = table.delete_item(
+            Key={"id": item_id},
+            ConditionExpression="#user = :user",
+            ExpressionAttributeNames={"#user": "user"},
+            ExpressionAttributeValues={":user": user_id},
+            ReturnValues="ALL_OLD",
+            ReturnValuesOnConditionCheckFailure="ALL_OLD",
+        )
+    except dynamodb_client.exceptions.ConditionalCheckFailedException as e:
+        # the current item only comes back when the row exists but belongs to someone else
+        return {"success": False, "found": "Item" in e.response}
+    return {"success": True, "item": response["Attributes"]}
 
-    # Fetch the thread from DynamoDB
-    response = threads_table.get_item(Key={"id": thread_id})
-    if "Item" not in response:
-        return {"success": False, "message": "Thread not found"}
 
-    # Authorization check
-    item = response["Item"]
-    if item["user"] != user_id:
+# puts back a record removed by delete_owned_item when the provider side could not be deleted
+def restore_deleted_item(table, item):
+    try:
+        table.put_item(Item=item)
+        return True
+    except Exception as e:
+        print(f"Error restoring {item['id']}: {e}")
+        return False
+
+
+def delete_thread_by_id(thread_id, user_id):
+    if not is_user_key(thread_id, user_id, "thr"):
         return {
             "success": False,
             "message": "You are not authorized to delete this thread",
         }
 
-    openai_thread_id = get(item, "data", openai_provider, "threadId")
+    deletion = delete_owned_item(threads_table, thread_id, user_id)
+    if not deletion["success"]:
+        if deletion["found"]:
+            return {
+                "success": False,
+                "message": "You are not authorized to delete this thread",
+            }
+        return {"success": False, "message": "Thread not found"}
+
+    item = deletion["item"]
+    openai_thread_id = provider_thread_id(item)
 
     # Ensure thread_id is valid
     print(f"Deleting thread: {thread_id} - {openai_provider}: {openai_thread_id}")
     if not openai_thread_id:
+        # the record has no provider thread to delete, keep it as it was
+        if not restore_deleted_item(threads_table, item):
+            return {
+                "success": False,
+                "message": "Thread not found and its record could not be restored",
+            }
         return {"success": False, "message": "Thread not found"}
 
     # Delete the thread using the OpenAI Client
-    result = client.beta.threads.delete(openai_thread_id)
+    try:
+        result = client.beta.threads.delete(openai_thread_id)
+        deleted = result.deleted
+    except Exception as e:
+        print(e)
+        deleted = False
 
-    if result.deleted:
-        # If the delete operation was successful, delete the entry from DynamoDB as well
-        threads_table.delete_item(Key={"id": thread_id})
+    if deleted:
         return {"success": True, "message": "Thread deleted successfully"}
-    else:
-        return {"success": False, "message": "Thread could not be deleted"}
+
+    # keep the record since the provider thread still exists
+    if not restore_deleted_item(threads_table, item):
+        return {
+            "success": False,
+            "message": "Thread could not be deleted and its record could not be restored",
+        }
+    return {"success": False, "message": "Thread could not be deleted"}
+
+
+# limited to only 20 files total per assistant in general by openai/azure
+MAX_ASSISTANT_FILES = 20
 
 
 def create_new_openai_assistant(assistant_name, instructions, file_keys):
     print("Creating assistant with ", openai_provider)
     # Create a new assistant using the OpenAI Client
 
-    # limited to only 20 files total per assistant in general by openai/azure
-    recent_file_keys = file_keys[-20:] if len(file_keys) > 20 else file_keys
-    print("File keys: ", recent_file_keys)
+    # callers pass at most MAX_ASSISTANT_FILES keys
+    print("File keys: ", file_keys)
 
-    file_ids = file_keys_to_file_ids(recent_file_keys)
+    file_ids = file_keys_to_file_ids(file_keys)
     assistant = (
         client.beta.assistants.create(
             name=assistant_name,
@@ -1067,26 +1510,24 @@ def create_new_openai_assistant(assistant_name, instructions, file_keys):
     return {"success": False, "error": "Failed to create assistant with openai"}
 
 
+def user_owns_file_key(user_id, file_key):
+    # only the segment between the first two "//" names the owner, splitting stops there
+    file_key_user = file_key.split("//", 2)[1] if ("//" in file_key) else file_key
+    return "@" in file_key_user and len(file_key_user) >= 6 and user_id in file_key_user
+
+
 def create_new_assistant(
     user_id, assistant_name, description, instructions, tags, file_keys
 ):
-    dynamodb = boto3.resource("dynamodb")
-    assistants_table = dynamodb.Table(
-        os.environ["ASSISTANT_CODE_INTERPRETER_DYNAMODB_TABLE"]
-    )
     timestamp = int(time.time() * 1000)
 
-    for file_key in file_keys:
-        file_key_user = file_key.split("//")[1] if ("//" in file_key) else file_key
-        if (
-            ("@" not in file_key_user)
-            or len(file_key_user) < 6
-            or (user_id not in file_key_user)
-        ):
-            return {
-                "success": False,
-                "error": "You are not authorized to access the referenced files",
-            }
+    # only the most recent files are attached, so only those are checked and stored
+    file_keys = file_keys[-MAX_ASSISTANT_FILES:]
+    if not all(user_owns_file_key(user_id, file_key) for file_key in file_keys):
+        return {
+            "success": False,
+            "error": "You are not authorized to access the referenced files",
+        }
 
     assistant_info = create_new_openai_assistant(
         assistant_name, instructions, file_keys
@@ -1122,51 +1563,56 @@ def create_new_assistant(
 
 
 def delete_assistant_by_id(assistant_id, user_id):
-    dynamodb = boto3.resource("dynamodb")
-    assistants_table = dynamodb.Table(
-        os.environ["ASSISTANT_CODE_INTERPRETER_DYNAMODB_TABLE"]
-    )
+    if not is_user_key(assistant_id, user_id, "ast"):
+        return {"success": False, "message": "Not authorized to delete this assistant"}
 
-    # Check if the assistant belongs to the user
+    # Delete the record only if the assistant belongs to the user
     try:
-        response = assistants_table.get_item(Key={"id": assistant_id})
+        deletion = delete_owned_item(assistants_table, assistant_id, user_id)
     except ClientError as e:
         print(e.response["Error"]["Message"])
         return {"success": False, "message": "Assistant not found"}
 
-    if "Item" not in response:
+    if not deletion["success"]:
+        if deletion["found"]:
+            return {
+                "success": False,
+                "message": "Not authorized to delete this assistant",
+            }
         return {"success": False, "message": "Assistant not found"}
 
-    item = response["Item"]
-
-    # Auth check: verify ownership
-    if item["user"] != user_id:
-        return {"success": False, "message": "Not authorized to delete this assistant"}
+    item = deletion["item"]
+    cached_assistants.pop((assistant_id, user_id), None)
 
     # Retrieve the OpenAI assistant ID
-    openai_assistant_id = item["data"][
-        "assistantId"
-    ]  # Or use your `get` utility function
+    openai_assistant_id = provider_assistant_id_of(item)
+    if not openai_assistant_id:
+        # the record has no provider assistant to delete, keep it as it was
+        if not restore_deleted_item(assistants_table, item):
+            return {
+                "success": False,
+                "message": "Assistant not found and its record could not be restored",
+            }
+        return {"success": False, "message": "Assistant not found"}
 
     # Delete the assistant from OpenAI
     try:
         assistant_deletion_result = client.beta.assistants.delete(
             assistant_id=openai_assistant_id
         )
+        deleted = assistant_deletion_result.deleted
+        error = "Failed to delete OpenAI assistant"
     except Exception as e:
-        return {"success": False, "message": f"Failed to delete OpenAI assistant: {e}"}
-
-    if not assistant_deletion_result.deleted:
-        return {"success": False, "message": "Failed to delete OpenAI assistant"}
+        deleted = False
+        error = f"Failed to delete OpenAI assistant: {e}"
 
-    # Delete the assistant record in DynamoDB
-    try:
-        assistants_table.delete_item(Key={"id": assistant_id})
-    except ClientError as e:
-        print(e.response["Error"]["Message"])
-        return {
-            "success": False,
-            "message": "Failed to delete assistant record from database",
-        }
+    if not deleted:
+        # restore the record since the provider assistant still exists
+        if not restore_deleted_item(assistants_table, item):
+            return {
+                "success": False,
+                "message": f"{error}, and the assistant record could not be restored",
+            }
+        return {"success": False, "message": error}
 
     return {"success": True, "message": "Assistant deleted successfully"}
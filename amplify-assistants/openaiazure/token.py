@@ -12,3 +12,9 @@ def count_tokens(text: str) -> int:
     encoding = tiktoken.get_encoding("cl100k_base")
     num_tokens = len(encoding.encode(text))
     return num_tokens
+
+
+def count_tokens_batch(texts: list[str]) -> list[int]:
+    """Returns the number of tokens in each text string, encoding them in one batch."""
+    encoding = tiktoken.get_encoding("cl100k_base")
+    return [len(tokens) for tokens in encoding.encode_batch(texts)]
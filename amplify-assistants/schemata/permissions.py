@@ -8,17 +8,11 @@ def get_permission_checker(user, ptype, op, data):
             user, ptype, op
         )
     )
-    return permissions_by_state_type.get(ptype, {}).get(
-        op, lambda for_user, with_data: False
-    )
-    print(
-        "Checking permissions for user: {} and type: {} and op: {}".format(
-            user, ptype, op
-        )
-    )
-    return permissions_by_state_type.get(ptype, {}).get(
-        op, lambda for_user, with_data: False
-    )
+    return permissions_by_state_type.get(ptype, {}).get(op, deny_all)
+
+
+def deny_all(user, data):
+    return False
 
 
 def can_create_assistant(user, data):
@@ -1,6 +1,7 @@
 # Copyright (c) 2024 Vanderbilt University
 # Authors: Jules White, Allen Karns, Karely Rodriguez, Max Moundas
 
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 import hashlib
 import os
@@ -8,7 +9,9 @@ import time
 import boto3
 import json
 import uuid
-from boto3.dynamodb.conditions import Key, Attr
+from boto3.dynamodb.conditions import Key
+from boto3.dynamodb.types import TypeSerializer
+from botocore.config import Config
 from botocore.exceptions import ClientError
 from decimal import Decimal
 from pycommon.const import APIAccessType
@@ -16,8 +19,21 @@ from pycommon.api.amplify_users import are_valid_amplify_users
 from pycommon.api.files import delete_file
 
 # Initialize AWS services
-dynamodb = boto3.resource("dynamodb")
-s3 = boto3.client("s3")
+# warm invocations reuse these, keep their connections alive and size the pool for the share fan out
+aws_config = Config(
+    max_pool_connections=32,
+    retries={"mode": "adaptive", "max_attempts": 5},
+    tcp_keepalive=True,
+)
+dynamodb = boto3.resource("dynamodb", config=aws_config)
+dynamodb_client = dynamodb.meta.client
+s3 = boto3.client("s3", config=aws_config)
+# created once per container, this also keeps threads from building boto3 objects concurrently
+assistants_table = dynamodb.Table(os.environ["ASSISTANTS_DYNAMODB_TABLE"])
+aliases_table = dynamodb.Table(os.environ["ASSISTANTS_ALIASES_DYNAMODB_TABLE"])
+shares_table = dynamodb.Table(os.environ["SHARES_DYNAMODB_TABLE"])
+object_access_table = dynamodb.Table(os.environ["OBJECT_ACCESS_DYNAMODB_TABLE"])
+lookup_table = dynamodb.Table(os.environ["ASSISTANT_LOOKUP_DYNAMODB_TABLE"])
 
 from pycommon.api.data_sources import (
     get_data_source_keys,
@@ -50,35 +66,34 @@ AMPLIFY_AUTOMATION_TAG = "amplify:automation"
 AMPLIFY_API_KEY_MANAGER_TAG = "amplify:api-key-manager"
 AMPLIFY_API_DOC_HELPER_TAG = "amplify:api-doc-helper"
 
-RESERVED_TAGS = [
-    SYSTEM_TAG,
-    ASSISTANT_BUILDER_TAG,
-    ASSISTANT_TAG,
-    AMPLIFY_AUTOMATION_TAG,
-    AMPLIFY_API_KEY_MANAGER_TAG,
-    AMPLIFY_API_DOC_HELPER_TAG,
-]
+RESERVED_TAGS = frozenset(
+    (
+        SYSTEM_TAG,
+        ASSISTANT_BUILDER_TAG,
+        ASSISTANT_TAG,
+        AMPLIFY_AUTOMATION_TAG,
+        AMPLIFY_API_KEY_MANAGER_TAG,
+        AMPLIFY_API_DOC_HELPER_TAG,
+    )
+)
+
+ASSISTANT_ACCESS_TYPES = frozenset(
+    (APIAccessType.ASSISTANTS.value, APIAccessType.FULL_ACCESS.value)
+)
+SHARE_ACCESS_TYPES = frozenset(
+    (APIAccessType.SHARE.value, APIAccessType.FULL_ACCESS.value)
+)
 
 
 def is_group_sys_user(data):
     return data.get("purpose", '') == "group"
 
+# share, delete and update all require owning the assistant
 def check_can_do(assistant, user_id):
     if assistant:
         return assistant["user"] == user_id
     return False
 
-def check_user_can_share_assistant(assistant, user_id):
-    return check_can_do(assistant, user_id)
-
-
-def check_user_can_delete_assistant(assistant, user_id):
-    return check_can_do(assistant, user_id)         
-
-
-def check_user_can_update_assistant(assistant, user_id):
-    return check_can_do(assistant, user_id)
-
 
 @api_tool(
     path="/assistant/delete",
@@ -123,7 +138,7 @@ def check_user_can_update_assistant(assistant, user_id):
 def delete_assistant(event, context, current_user, name, data):
     access = data["allowed_access"]
     access_token = data["access_token"]
-    if APIAccessType.ASSISTANTS.value not in access and APIAccessType.FULL_ACCESS.value not in access:
+    if ASSISTANT_ACCESS_TYPES.isdisjoint(access):
         return {
             "success": False,
             "message": "API key does not have access to assistant functionality",
@@ -150,16 +165,13 @@ def delete_assistant(event, context, current_user, name, data):
         print("Assistant ID is required for deletion.")
         return {"success": False, "message": "Assistant ID is required for deletion."}
 
-    dynamodb = boto3.resource("dynamodb")
-    assistants_table = dynamodb.Table(os.environ["ASSISTANTS_DYNAMODB_TABLE"])
-
     try:
         # Check if the user is authorized to delete the assistant
         existing_assistant = get_most_recent_assistant_version(
             assistants_table, assistant_public_id
         )
 
-        if not check_user_can_delete_assistant(existing_assistant, current_user):
+        if not check_can_do(existing_assistant, current_user):
             print(f"User {current_user} is not authorized to delete assistant {assistant_public_id}")
             return {
                 "success": False,
@@ -167,7 +179,6 @@ def delete_assistant(event, context, current_user, name, data):
             }
 
             # First, delete any paths associated with this assistant
-        lookup_table = dynamodb.Table(os.environ.get("ASSISTANT_LOOKUP_DYNAMODB_TABLE"))
         # Query for all paths belonging to this assistant
         response = lookup_table.query(
             IndexName="AssistantIdIndex",
@@ -182,7 +193,6 @@ def delete_assistant(event, context, current_user, name, data):
 
         astIconDs = existing_assistant.get("data", {}).get("astIcon")
         if (astIconDs):
-            print(f"Deleting assistant Icon file: {astIconDs}")
             metadata = astIconDs.get("metadata")
             key = astIconDs.get("key") or (metadata.get("contentKey") if metadata else None)
             print(f"Deleting assistant Icon file: {key}")
@@ -199,13 +209,9 @@ def delete_assistant(event, context, current_user, name, data):
 
         # delete asistant specific data sources - those with ds with ds.metadata.type starts with "assistant-
         dataSources = existing_assistant.get("dataSources", [])
-        print(f"DataSources: {dataSources}")
-
-        for i, ds in enumerate(dataSources):
-            print(f"Processing datasource {i}: {ds}")
+        for ds in dataSources:
             metadata = ds.get("metadata") if ds else None
             if metadata and metadata.get("type", "").startswith("assistant"):
-                print(f"Found assistant-specific datasource")
                 key = extract_key(ds.get("key")) if ds.get("key") else ds.get("id")
                 print(f"Deleting assistant specific data source: {key}")
                 delete_file(access_token, key)
@@ -325,7 +331,7 @@ def delete_assistant(event, context, current_user, name, data):
 @validated(op="list")
 def list_assistants(event, context, current_user, name, data):
     access = data["allowed_access"]
-    if APIAccessType.ASSISTANTS.value not in access and APIAccessType.FULL_ACCESS.value not in access:
+    if ASSISTANT_ACCESS_TYPES.isdisjoint(access):
         return {
             "success": False,
             "message": "API key does not have access to assistant functionality",
@@ -353,19 +359,12 @@ def list_assistants(event, context, current_user, name, data):
             data["access_token"], assistant_ids, ["read", "write"]
         )
 
-    # Make sure each assistant has a data field and initialize it if it doesn't
-    for assistant in assistants:
-        if "data" not in assistant:
-            assistant["data"] = {}
-
-    # for each assistant, add to its data the access rights
+    # for each assistant, add to its data the access rights, initializing the data field if needed
     for assistant in assistants:
-        try:
-            if assistant["data"] is None:
-                assistant["data"] = {"access": None}
-            assistant["data"]["access"] = access_rights.get(assistant["id"], {})
-        except Exception as e:
-            print(f"Error adding access rights to assistant {assistant['id']}: {e}")
+        assistant_data = assistant.get("data")
+        if assistant_data is None:
+            assistant_data = assistant["data"] = {}
+        assistant_data["access"] = access_rights.get(assistant["id"], {})
 
     return {
         "success": True,
@@ -384,9 +383,6 @@ def list_user_assistants(user_id):
     Returns:
         list: A list of dictionaries, where each dictionary represents an assistant.
     """
-    dynamodb = boto3.resource("dynamodb")
-    assistants_table = dynamodb.Table(os.environ["ASSISTANTS_DYNAMODB_TABLE"])
-
     assistants = []
     last_evaluated_key = None
 
@@ -432,6 +428,13 @@ def get_latest_assistants(assistants):
     return list(latest_assistants.values())
 
 
+# assistant id -> (time cached, item). every version is its own item and is rarely updated in
+# place, writers in this container evict the entry and the short ttl bounds staleness elsewhere
+cached_assistants = {}
+ASSISTANT_CACHE_TTL = 30
+MAX_CACHED_ASSISTANTS = 1024
+
+
 def get_assistant(assistant_id):
     """
     Retrieves the assistant with the given ID.
@@ -442,8 +445,9 @@ def get_assistant(assistant_id):
     Returns:
         dict: A dictionary representing the assistant, or None if the assistant is not found.
     """
-    dynamodb = boto3.resource("dynamodb")
-    assistants_table = dynamodb.Table(os.environ["ASSISTANTS_DYNAMODB_TABLE"])
+    cached = cached_assistants.get(assistant_id)
+    if cached and time.time() - cached[0] < ASSISTANT_CACHE_TTL:
+        return cached[1]
 
     try:
         # Fetch the item from the DynamoDB table using the assistant ID
@@ -451,6 +455,9 @@ def get_assistant(assistant_id):
 
         # If the item is found, return it
         if "Item" in response:
+            if len(cached_assistants) >= MAX_CACHED_ASSISTANTS:
+                cached_assistants.clear()
+            cached_assistants[assistant_id] = (time.time(), response["Item"])
             return response["Item"]
         else:
             return None
@@ -577,16 +584,15 @@ def get_assistant(assistant_id):
 def create_assistant(event, context, current_user, name, data):
     access = data["allowed_access"]
     access_token = data["access_token"]
-    if APIAccessType.ASSISTANTS.value not in access and APIAccessType.FULL_ACCESS.value not in access:
+    if ASSISTANT_ACCESS_TYPES.isdisjoint(access):
         return {
             "success": False,
             "message": "API key does not have access to assistant functionality",
         }
 
-    print(f"Creating assistant with data: {data}")
-
     extracted_data = data["data"]
     assistant_name = extracted_data["name"]
+    print(f"Creating assistant {assistant_name} for user {current_user}")
     description = extracted_data["description"]
     uri = extracted_data.get("uri", None)
     assistant_public_id = extracted_data.get("assistantId", None)
@@ -645,7 +651,7 @@ def create_assistant(event, context, current_user, name, data):
                     all_website_urls.append(website_url_entry)
                     print(f"Added new website URL to tracking: {url}")
                 
-                print(f"Website data source needs scraping: {source}")
+                print(f"Website data source needs scraping: {url}")
                 website_data_sources.append(source)
             else:
                 # This is EXISTING scraped content - preserve as data source
@@ -704,27 +710,20 @@ def create_assistant(event, context, current_user, name, data):
         tag_data_sources = []
 
         for source in standard_data_sources:
-            if source["id"].startswith("tag://"):
+            source_id = source["id"]
+            if source_id.startswith("tag://"):
                 tag_data_sources.append(source)
-            else:
-                filtered_ds.append(source)
+                continue
+            # sources without a scheme are referenced by their key
+            if "://" not in source_id:
+                source = {**source, "id": source.get("key", source_id)}
+            filtered_ds.append(source)
 
-        print(f"Tag Data sources: {tag_data_sources}")
+        print(f"{len(filtered_ds)} data sources, {len(tag_data_sources)} tag data sources")
 
         if len(filtered_ds) > 0:
-            print(f"Data sources before translation: {filtered_ds}")
-
-            for i in range(len(filtered_ds)):
-                source = filtered_ds[i]
-                if "://" not in source["id"]:
-                    filtered_ds[i]["id"] = source.get("key", source.get("id", ""))
-
-            print(f"Final data sources before translation: {filtered_ds}")
-
             filtered_ds = translate_user_data_sources_to_hash_data_sources(filtered_ds)
 
-            print(f"Data sources after translation and extraction: {filtered_ds}")
-
             # Only check permissions on standard data sources
             if filtered_ds and not can_access_objects(
                 data["access_token"], filtered_ds
@@ -744,8 +743,6 @@ def create_assistant(event, context, current_user, name, data):
     final_data_sources += scraped_data_sources 
     # + drive_data_sources
 
-    print(f"final_data_sources: {final_data_sources}")
-
     # Create or update the assistant with the final data sources
     return create_or_update_assistant(
         current_user=current_user,
@@ -846,7 +843,7 @@ def create_assistant(event, context, current_user, name, data):
 def share_assistant(event, context, current_user, name, data):
     access = data["allowed_access"]
     access_token = data["access_token"]
-    if APIAccessType.SHARE.value not in access and APIAccessType.FULL_ACCESS.value not in access:
+    if SHARE_ACCESS_TYPES.isdisjoint(access):
         return {
             "success": False,
             "message": "API key does not have access to share functionality",
@@ -889,7 +886,17 @@ def share_assistant_with(
     share_to_S3,
     policy="",
 ):  # data_sources,
-    assistant_entry = get_assistant(assistant_key)
+    # the assistant lookup and the ownership check only depend on the key, run them together.
+    # the lookup stays on this thread, boto3 resources are not safe to share across threads
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        ownership_check = executor.submit(
+            can_access_objects,
+            access_token=access_token,
+            data_sources=[{"id": assistant_key}],
+            permission_level="owner",
+        )
+        assistant_entry = get_assistant(assistant_key)
+        is_owner = ownership_check.result()
 
     if not assistant_entry:
         return {"success": False, "message": "Assistant not found"}
@@ -897,11 +904,7 @@ def share_assistant_with(
     data_sources = get_data_source_keys(assistant_entry["dataSources"])
     # print("DS: ", data_sources)
 
-    if not can_access_objects(
-        access_token=access_token,
-        data_sources=[{"id": assistant_key}],
-        permission_level="owner",
-    ):
+    if not is_owner:
         return {
             "success": False,
             "message": "You are not authorized to share this assistant",
@@ -924,36 +927,31 @@ def share_assistant_with(
         print(
             f"Update data sources object access permissions for users {recipient_users} for assistant {assistant_public_id}"
         )
-        update_object_permissions(
-            access_token=access_token,
-            shared_with_users=recipient_users,
-            keys=data_sources,
-            object_type="datasource",
-            principal_type="user",
-            permission_level="read",
-            policy="",
-        )
-
-        failed_shares = []
-        for user in recipient_users:
-
-            print(f"Creating alias for user {user} for assistant {assistant_public_id}")
-            create_assistant_alias(
-                user,
-                assistant_public_id,
-                assistant_entry["id"],
-                assistant_entry["version"],
-                "latest",
+        # the data source permissions and every recipient's alias and share are independent writes
+        with ThreadPoolExecutor(max_workers=min(16, len(recipient_users) + 1)) as executor:
+            data_source_permissions = executor.submit(
+                update_object_permissions,
+                access_token=access_token,
+                shared_with_users=recipient_users,
+                keys=data_sources,
+                object_type="datasource",
+                principal_type="user",
+                permission_level="read",
+                policy="",
             )
-            print(f"Created alias for user {user} for assistant {assistant_public_id}")
+            shared = list(
+                executor.map(
+                    lambda user: share_assistant_with_user(
+                        current_user, user, assistant_entry, note, share_to_S3
+                    ),
+                    recipient_users,
+                )
+            )
+            data_source_permissions.result()
 
-            # if api accessed
-            if share_to_S3:
-                print("API_accessed, sending to s3...")
-                result = assistant_share_save(current_user, user, note, assistant_entry)
-                if not result["success"]:
-                    print("Failed share for: ", user)
-                    failed_shares.append(user)
+        failed_shares = [
+            user for user, success in zip(recipient_users, shared) if not success
+        ]
 
         print(f"Successfully updated permissions for assistant {assistant_public_id}")
         if len(failed_shares) > 0:
@@ -969,6 +967,27 @@ def share_assistant_with(
         }
 
 
+def share_assistant_with_user(current_user, user, assistant_entry, note, share_to_S3):
+    assistant_public_id = assistant_entry["assistantId"]
+    create_assistant_alias(
+        user,
+        assistant_public_id,
+        assistant_entry["id"],
+        assistant_entry["version"],
+        "latest",
+    )
+    print(f"Created alias for user {user} for assistant {assistant_public_id}")
+
+    # if api accessed
+    if share_to_S3:
+        print("API_accessed, sending to s3...")
+        result = assistant_share_save(current_user, user, note, assistant_entry)
+        if not result["success"]:
+            print("Failed share for: ", user)
+            return False
+    return True
+
+
 def assistant_share_save(current_user, shared_with, note, assistant):
     try:
         # Generate a unique file key for each user
@@ -978,9 +997,10 @@ def assistant_share_save(current_user, shared_with, note, assistant):
         )
 
         ast_id = assistant["id"]
-        ast = assistant
-        ast["tools"] = []
-        ast["fileKeys"] = []
+        # copies keep the (possibly cached and concurrently shared) assistant item unchanged
+        ast_data = {**assistant.get("data", {})}
+        ast_data["access"] = {**ast_data["access"], "write": False}
+        ast = {**assistant, "tools": [], "fileKeys": [], "data": ast_data}
         # match frontend prompt data
         ast_prompt = {
             "id": ast_id,
@@ -991,14 +1011,13 @@ def assistant_share_save(current_user, shared_with, note, assistant):
             "folderId": "assistants",
             "data": {
                 "assistant": {"id": ast_id, "definition": ast},
-                **(assistant.get("data", {})),
+                **ast_data,
                 "noCopy": True,
                 "noEdit": True,
                 "noDelete": True,
                 "noShare": True,
             },
         }
-        ast_prompt["data"]["access"]["write"] = False
         shared_data = {
             "version": 1,
             "history": [],
@@ -1007,22 +1026,26 @@ def assistant_share_save(current_user, shared_with, note, assistant):
             "sharedBy": current_user,
         }
         bucket_name = os.environ["S3_SHARE_BUCKET_NAME"]
-        s3_client = boto3.client("s3")
 
         print("Put assistant in s3")
-        s3_client.put_object(
+        s3.put_object(
             Body=json.dumps(shared_data, default=str).encode(),
             Bucket=bucket_name,
             Key=s3_key,
         )
 
-        dynamodb = boto3.resource("dynamodb")
-        table = dynamodb.Table(os.environ["SHARES_DYNAMODB_TABLE"])
-
+        # runs on the share worker threads, the low level client is thread safe where the table resource is not
+        serializer = TypeSerializer()
         name = "/state/share"
-        response = table.query(
+        response = dynamodb_client.query(
+            TableName=shares_table.name,
             IndexName="UserNameIndex",
-            KeyConditionExpression=Key("user").eq(shared_with) & Key("name").eq(name),
+            KeyConditionExpression="#user = :user AND #name = :name",
+            ExpressionAttributeNames={"#user": "user", "#name": "name"},
+            ExpressionAttributeValues={
+                ":user": serializer.serialize(shared_with),
+                ":name": serializer.serialize(name),
+            },
         )
 
         items = response.get("Items")
@@ -1048,25 +1071,31 @@ def assistant_share_save(current_user, shared_with, note, assistant):
                 "createdAt": timestamp,
                 "updatedAt": timestamp,
             }
-            table.put_item(Item=new_item)
+            dynamodb_client.put_item(
+                TableName=shares_table.name,
+                Item={k: serializer.serialize(v) for k, v in new_item.items()},
+            )
 
         else:
             # Otherwise, update the existing item
             item = items[0]
 
-            result = table.update_item(
+            result = dynamodb_client.update_item(
+                TableName=shares_table.name,
                 Key={"id": item["id"]},
                 ExpressionAttributeNames={"#data": "data"},
                 ExpressionAttributeValues={
-                    ":data": [
-                        {
-                            "sharedBy": current_user,
-                            "note": note,
-                            "sharedAt": timestamp,
-                            "key": s3_key,
-                        }
-                    ],
-                    ":updatedAt": timestamp,
+                    ":data": serializer.serialize(
+                        [
+                            {
+                                "sharedBy": current_user,
+                                "note": note,
+                                "sharedAt": timestamp,
+                                "key": s3_key,
+                            }
+                        ]
+                    ),
+                    ":updatedAt": serializer.serialize(timestamp),
                 },
                 UpdateExpression="SET #data = list_append(#data, :data), updatedAt = :updatedAt",
                 ReturnValues="ALL_NEW",
@@ -1086,28 +1115,44 @@ def decimal_to_float(obj):
     raise TypeError("Object of type 'Decimal' is not JSON serializable")
 
 
-def get_most_recent_assistant_version(assistants_table, assistant_public_id):
+# assistant public id -> (time cached, latest version item), only read by lookups that don't write a
+# new version from the result. writers in this container evict the entry, the ttl bounds how long a
+# version saved by another container can be missed
+cached_latest_assistants = {}
+LATEST_ASSISTANT_CACHE_TTL = 30
+MAX_CACHED_LATEST_ASSISTANTS = 1024
+
+
+def get_most_recent_assistant_version(assistants_table, assistant_public_id, use_cache=False):
     """
     Retrieves the most recent version of an assistant from the DynamoDB table.
 
     Args:
         assistants_table (boto3.Table): The DynamoDB table for assistants.
-        user_that_owns_the_assistant (str): The ID of the user that owns the assistant.
-        assistant_name (str): The name of the assistant.
         assistant_public_id (str): The public ID of the assistant (optional).
+        use_cache (bool): Whether a recently cached result may be returned, only for read only callers.
 
     Returns:
         dict: The most recent assistant item, or None if not found.
     """
     if assistant_public_id:
+        if use_cache:
+            cached = cached_latest_assistants.get(assistant_public_id)
+            if cached and time.time() - cached[0] < LATEST_ASSISTANT_CACHE_TTL:
+                return cached[1]
+
         response = assistants_table.query(
             IndexName="AssistantIdIndex",
             KeyConditionExpression=Key("assistantId").eq(assistant_public_id),
             Limit=1,
             ScanIndexForward=False,
         )
+        # version is the index range key, so the single descending result is the latest
         if response["Count"] > 0:
-            return max(response["Items"], key=lambda x: x.get("version", 1))
+            if len(cached_latest_assistants) >= MAX_CACHED_LATEST_ASSISTANTS:
+                cached_latest_assistants.clear()
+            cached_latest_assistants[assistant_public_id] = (time.time(), response["Items"][0])
+            return response["Items"][0]
 
     return None
 
@@ -1128,6 +1173,8 @@ def save_assistant(
     uri=None,
     assistant_public_id=None,
     is_group_user=False,
+    latest_alias_user=None,
+    hashes=None,
 ):
     """
     Saves the assistant data to the DynamoDB table.
@@ -1142,6 +1189,8 @@ def save_assistant(
         tools (list): A list of tools used by the assistant.
         user_that_owns_the_assistant (str): The ID of the user that owns the assistant.
         assistant_public_id (str): The public ID of the assistant (optional).
+        latest_alias_user (str): If set, a latest alias for this user is written in the same transaction (optional).
+        hashes (tuple): The get_assistant_hashes result if the caller already computed it (optional).
 
     Returns:
         dict: The saved assistant data.
@@ -1155,21 +1204,23 @@ def save_assistant(
 
     # Create a dictionary of the core details of the assistant
     # This will be used to create a hash to check if the assistant already exists
+    if hashes is None:
+        hashes = get_assistant_hashes(
+            assistant_name,
+            description,
+            instructions,
+            disclaimer,
+            data_sources,
+            provider,
+            tools,
+        )
     (
         core_sha256,
         datasources_sha256,
         full_sha256,
         instructions_sha256,
         disclaimer_sha256,
-    ) = get_assistant_hashes(
-        assistant_name,
-        description,
-        instructions,
-        disclaimer,
-        data_sources,
-        provider,
-        tools,
-    )
+    ) = hashes
 
     # to differentiate Group ast because when a group member chats with it they wont have access directly but the group system user will
     # so the object access relies on looking up if a user is a member of that group and the group system user has perms
@@ -1203,10 +1254,56 @@ def save_assistant(
         "version": version,
     }
 
-    assistants_table.put_item(Item=new_item)
+    if latest_alias_user:
+        # the version and its alias are written together, so neither can exist without the other.
+        # the version id is a fresh uuid, so neither put carries an attribute_not_exists condition
+        alias_item = assistant_alias_item(
+            latest_alias_user, assistant_public_id, assistant_database_id, version, "latest"
+        )
+        serializer = TypeSerializer()
+        dynamodb_client.transact_write_items(
+            TransactItems=[
+                {
+                    "Put": {
+                        "TableName": assistants_table.name,
+                        "Item": {k: serializer.serialize(v) for k, v in new_item.items()},
+                    }
+                },
+                {
+                    "Put": {
+                        "TableName": aliases_table.name,
+                        "Item": {k: serializer.serialize(v) for k, v in alias_item.items()},
+                    }
+                },
+            ]
+        )
+    else:
+        assistants_table.put_item(Item=new_item)
+    cached_latest_assistants.pop(assistant_public_id, None)
     return new_item
 
 
+def query_all_items(table, **query_params):
+    """
+    Yields every item matched by a query, following LastEvaluatedKey across result pages.
+
+    Args:
+        table (boto3.Table): The DynamoDB table to query.
+        **query_params: The parameters passed to each query call.
+
+    Yields:
+        dict: Each matching item.
+    """
+    while True:
+        response = table.query(**query_params)
+        yield from response.get("Items", [])
+
+        last_evaluated_key = response.get("LastEvaluatedKey")
+        if not last_evaluated_key:
+            break
+        query_params["ExclusiveStartKey"] = last_evaluated_key
+
+
 def delete_assistant_by_public_id(assistants_table, assistant_public_id):
     """
     Deletes all versions of an assistant from the DynamoDB table based on the assistant's public ID.
@@ -1218,13 +1315,19 @@ def delete_assistant_by_public_id(assistants_table, assistant_public_id):
     Returns:
         None
     """
-    response = assistants_table.query(
+    items = query_all_items(
+        assistants_table,
         IndexName="AssistantIdIndex",
         KeyConditionExpression=Key("assistantId").eq(assistant_public_id),
+        ProjectionExpression="id",
     )
 
-    for item in response["Items"]:
-        assistants_table.delete_item(Key={"id": item["id"]})
+    # the batch writer sends up to 25 deletes per request and resends unprocessed items
+    with assistants_table.batch_writer() as batch:
+        for item in items:
+            batch.delete_item(Key={"id": item["id"]})
+            cached_assistants.pop(item["id"], None)
+    cached_latest_assistants.pop(assistant_public_id, None)
 
 
 @validated(op="remove_astp_permissions")
@@ -1240,31 +1343,33 @@ def remove_shared_ast_permissions(event, context, current_user, name, data):
 
 def delete_assistant_permissions_by_public_id(assistant_public_id, users):
     # delete public id is not as sensitive as assistant id
-    dynamodb = boto3.resource("dynamodb")
-    table = dynamodb.Table(os.environ["OBJECT_ACCESS_DYNAMODB_TABLE"])
-    for user in users:
-        try:
-            response = table.delete_item(
-                Key={"object_id": assistant_public_id, "principal_id": user}
-            )
-            print(f"Deleted permissions for user {user}")
-        except Exception as e:
-            print(f"Failed to delete permissions for user {user}. Error: {str(e)}")
+    try:
+        # the batch writer sends up to 25 deletes per request and resends unprocessed items,
+        # the caller may list a user twice and a batch can't repeat a key
+        with object_access_table.batch_writer(
+            overwrite_by_pkeys=["object_id", "principal_id"]
+        ) as batch:
+            for user in users:
+                batch.delete_item(
+                    Key={"object_id": assistant_public_id, "principal_id": user}
+                )
+        print(f"Deleted permissions for users {users}")
+    except Exception as e:
+        print(f"Failed to delete permissions for users {users}. Error: {str(e)}")
+        return {"success": False, "message": "Failed to delete permissions."}
 
     return {"success": True, "message": "Permissions successfully deleted."}
 
 
 def delete_assistant_permissions_by_id(ast_id, current_user):
     # current user must be principal user to do this
-    dynamodb = boto3.resource("dynamodb")
-    table = dynamodb.Table(os.environ["OBJECT_ACCESS_DYNAMODB_TABLE"])
     try:
-        response = table.get_item(
+        response = object_access_table.get_item(
             Key={"object_id": ast_id, "principal_id": current_user}
         )
 
         if "Item" in response:
-            delete_response = table.delete_item(
+            delete_response = object_access_table.delete_item(
                 Key={"object_id": ast_id, "principal_id": current_user}
             )
             print(f"Permissions deleted for assistant ID {ast_id}.")
@@ -1290,28 +1395,7 @@ def delete_assistant_by_id(assistants_table, assistant_id):
         None
     """
     assistants_table.delete_item(Key={"id": assistant_id})
-
-
-def delete_assistant_version(assistants_table, assistant_public_id, version):
-    """
-    Deletes a specific version of an assistant from the DynamoDB table based on the assistant's public ID and version.
-
-    Args:
-        assistants_table (boto3.Table): The DynamoDB table for assistants.
-        assistant_public_id (str): The public ID of the assistant.
-        version (int): The version of the assistant to delete.
-
-    Returns:
-        None
-    """
-    response = assistants_table.query(
-        IndexName="AssistantIdIndex",
-        KeyConditionExpression=Key("assistantId").eq(assistant_public_id),
-        FilterExpression=Attr("version").eq(version),
-    )
-
-    for item in response["Items"]:
-        assistants_table.delete_item(Key={"id": item["id"]})
+    cached_assistants.pop(assistant_id, None)
 
 
 def create_or_update_assistant(
@@ -1350,10 +1434,6 @@ def create_or_update_assistant(
     Returns:
         dict: A dictionary containing the success status, message, and data (assistant ID and version).
     """
-    dynamodb = boto3.resource("dynamodb")
-    assistants_table = dynamodb.Table(os.environ["ASSISTANTS_DYNAMODB_TABLE"])
-    object_access_table = dynamodb.Table(os.environ.get("OBJECT_ACCESS_DYNAMODB_TABLE"))
-
     existing_assistant = get_most_recent_assistant_version(
         assistants_table, assistant_public_id
     )
@@ -1362,7 +1442,7 @@ def create_or_update_assistant(
 
     if existing_assistant:
 
-        if not check_user_can_update_assistant(
+        if not check_can_do(
             existing_assistant, user_that_owns_the_assistant
         ):
             return {
@@ -1370,6 +1450,30 @@ def create_or_update_assistant(
                 "message": "You are not authorized to update this assistant",
             }
 
+        # the full hash covers everything but the data, tags and uri, if none of it changed
+        # there is nothing to version and the owner already holds every permission
+        hashes = get_assistant_hashes(
+            assistant_name, description, instructions, disclaimer, data_sources, provider, tools
+        )
+        if (
+            existing_assistant.get("hash") == hashes[2]
+            and existing_assistant.get("data", {}) == assistant_data
+            and existing_assistant.get("tags") == tags
+            and existing_assistant.get("uri") == uri
+        ):
+            print(f"Assistant {existing_assistant['id']} is unchanged, skipping save")
+            return {
+                "success": True,
+                "message": "Assistant created successfully",
+                "data": {
+                    "assistantId": existing_assistant["assistantId"],
+                    "id": existing_assistant["id"],
+                    "version": existing_assistant["version"],
+                    "data_sources": existing_assistant.get("dataSources", []),
+                    "ast_data": existing_assistant.get("data", {}),
+                },
+            }
+
         # The assistant already exists, so we need to create a new version
         assistant_public_id = existing_assistant["assistantId"]
         assistant_name = assistant_name
@@ -1404,6 +1508,7 @@ def create_or_update_assistant(
             uri,
             assistant_public_id,
             is_group_user,
+            hashes=hashes,
         )
         new_item["version"] = new_version
 
@@ -1417,51 +1522,70 @@ def create_or_update_assistant(
                source.get("metadata", {}).get("type") != "assistant-web-content"
         ]
         
-        # Set permissions for the assistant
-        if not update_object_permissions(
-            access_token,
-            [user_that_owns_the_assistant],
-            [new_item["id"], new_item["assistantId"]],
-            "assistant",
-            principal_type,
-            "owner"):
-            print(f"Error updating permissions for assistant {new_item['id']}")
-
-        print(f"Successfully updated permissions for assistant {new_item['id']}")
-
-        # Set permissions for all data sources, including scraped content
-        if all_data_source_keys:
-            update_result = update_object_permissions(
+        # the permission api calls run on the pool while the dynamodb writes stay on this thread,
+        # boto3 resources are not safe to share across threads
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            # Set permissions for the assistant
+            assistant_permissions = executor.submit(
+                update_object_permissions,
                 access_token,
                 [user_that_owns_the_assistant],
-                all_data_source_keys,
-                "datasource",
+                [new_item["id"], new_item["assistantId"]],
+                "assistant",
                 principal_type,
                 "owner",
             )
-            if not update_result:
+            # Set permissions for all data sources, including scraped content
+            data_source_permissions = None
+            if all_data_source_keys:
+                data_source_permissions = executor.submit(
+                    update_object_permissions,
+                    access_token,
+                    [user_that_owns_the_assistant],
+                    all_data_source_keys,
+                    "datasource",
+                    principal_type,
+                    "owner",
+                )
+
+            # Update permissions for the new version to ensure the user retains edit rights
+            try:
+                # Add direct permissions entry in DynamoDB for the new version ID
+                object_access_table.put_item(
+                    Item={
+                        "object_id": new_item["id"],  # The ID of the new assistant version
+                        "principal_id": user_that_owns_the_assistant,
+                        "permission_level": "owner",  # Give the user full ownership rights
+                        "principal_type": principal_type,  # For individual users or groups
+                        "object_type": "assistant",  # The type of object being accessed
+                    }
+                )
+                print( f"Successfully added direct permissions for {principal_type} {user_that_owns_the_assistant} on assistant version {new_item['id']}" )
+            except Exception as e:
+                print(f"Error adding permissions for assistant version: {str(e)}")
+
+            # Update the latest alias to point to the new version
+            latest_alias = update_assistant_latest_alias(
+                assistant_public_id, new_item["id"], new_version
+            )
+
+        if not assistant_permissions.result():
+            print(f"Error updating permissions for assistant {new_item['id']}")
+
+        print(f"Successfully updated permissions for assistant {new_item['id']}")
+
+        if data_source_permissions:
+            if not data_source_permissions.result():
                 print(f"Error updating permissions for data sources: {all_data_source_keys}")
             else:
                 print(f"Successfully updated permissions for data sources: {all_data_source_keys}")
 
-        # Update permissions for the new version to ensure the user retains edit rights
-        try:
-            # Add direct permissions entry in DynamoDB for the new version ID
-            object_access_table.put_item(
-                Item={
-                    "object_id": new_item["id"],  # The ID of the new assistant version
-                    "principal_id": user_that_owns_the_assistant,
-                    "permission_level": "owner",  # Give the user full ownership rights
-                    "principal_type": principal_type,  # For individual users or groups
-                    "object_type": "assistant",  # The type of object being accessed
-                }
-            )
-            print( f"Successfully added direct permissions for {principal_type} {user_that_owns_the_assistant} on assistant version {new_item['id']}" )
-        except Exception as e:
-            print(f"Error adding permissions for assistant version: {str(e)}")
-
-        # Update the latest alias to point to the new version
-        update_assistant_latest_alias(assistant_public_id, new_item["id"], new_version)
+        # without the alias update users keep chatting with the previous version
+        if not latest_alias["success"]:
+            return {
+                "success": False,
+                "message": f"Assistant version {new_version} was saved but could not be made the latest version",
+            }
 
         # print(f"Indexing assistant {new_item['id']} for RAG")
 
@@ -1496,56 +1620,59 @@ def create_or_update_assistant(
             uri,
             None,
             is_group_user,
+            latest_alias_user=user_that_owns_the_assistant,
         )
 
         # Set permissions for all data sources, including scraped content
         all_data_source_keys = [source["id"] for source in data_sources]
 
-        if not update_object_permissions(
-            access_token,
-            [user_that_owns_the_assistant],
-            [new_item["assistantId"], new_item["id"]],
-            "assistant",
-            principal_type,
-            "owner",
-        ):
-            print(f"Error updating permissions for assistant {new_item['id']}")
-
-        print(f"Successfully updated permissions for assistant {new_item['id']}")
-
-        # Set permissions for all data sources
-        if all_data_source_keys:
-            update_object_permissions(
+        # the assistant and its latest alias are saved, the permission api calls run on the pool
+        # while the dynamodb writes stay on this thread, boto3 resources are not safe to share across threads
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            assistant_permissions = executor.submit(
+                update_object_permissions,
                 access_token,
                 [user_that_owns_the_assistant],
-                all_data_source_keys,
-                "datasource",
+                [new_item["assistantId"], new_item["id"]],
+                "assistant",
                 principal_type,
                 "owner",
             )
+            # Set permissions for all data sources
+            data_source_permissions = None
+            if all_data_source_keys:
+                data_source_permissions = executor.submit(
+                    update_object_permissions,
+                    access_token,
+                    [user_that_owns_the_assistant],
+                    all_data_source_keys,
+                    "datasource",
+                    principal_type,
+                    "owner",
+                )
 
-        try:
-            for object_id in [new_item["id"], new_item[ "assistantId"]]:
-                object_access_table.put_item(
-                Item={
-                    "object_id": object_id,  
-                    "principal_id": user_that_owns_the_assistant,
-                    "permission_level": "owner",  # Give the user full ownership rights
-                    "principal_type": principal_type,  # For individual users or groups
-                    "object_type": "assistant",  # The type of object being accessed
-                }
-            )
-            print(f"Successfully added direct permissions for {principal_type} {user_that_owns_the_assistant} on assistant {new_item['id']} and {new_item['assistantId']}")
-        except Exception as e:
-            print(f"Error adding direct permissions for assistant: {str(e)}")
+            try:
+                for object_id in [new_item["id"], new_item["assistantId"]]:
+                    object_access_table.put_item(
+                        Item={
+                            "object_id": object_id,
+                            "principal_id": user_that_owns_the_assistant,
+                            "permission_level": "owner",  # Give the user full ownership rights
+                            "principal_type": principal_type,  # For individual users or groups
+                            "object_type": "assistant",  # The type of object being accessed
+                        }
+                    )
+                print(f"Successfully added direct permissions for {principal_type} {user_that_owns_the_assistant} on assistant {new_item['id']} and {new_item['assistantId']}")
+            except Exception as e:
+                print(f"Error adding direct permissions for assistant: {str(e)}")
 
-        create_assistant_alias(
-            user_that_owns_the_assistant,
-            new_item["assistantId"],
-            new_item["id"],
-            1,
-            "latest",
-        )
+        if not assistant_permissions.result():
+            print(f"Error updating permissions for assistant {new_item['id']}")
+
+        print(f"Successfully updated permissions for assistant {new_item['id']}")
+
+        if data_source_permissions:
+            data_source_permissions.result()
 
         # print(f"Indexing assistant {new_item['id']} for RAG")
         # save_assistant_for_rag(new_item)
@@ -1565,38 +1692,48 @@ def create_or_update_assistant(
         }
 
 
+def to_canonical_json(value):
+    return json.dumps(value, sort_keys=True, cls=CustomPydanticJSONEncoder)
+
+
+def sha256_of_text(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def sha256_of_json_fields(encoded_fields):
+    # hashes the same text to_canonical_json gives for the dict, from fields that are already encoded
+    hasher = hashlib.sha256(b"{")
+    for i, key in enumerate(sorted(encoded_fields)):
+        if i:
+            hasher.update(b", ")
+        hasher.update(f"{json.dumps(key)}: {encoded_fields[key]}".encode())
+    hasher.update(b"}")
+    return hasher.hexdigest()
+
+
 def get_assistant_hashes(
     assistant_name, description, instructions, disclaimer, data_sources, provider, tools
 ):
-    core_details = {
-        "instructions": instructions,
-        "disclaimer": disclaimer,
-        "dataSources": data_sources,
-        "tools": tools,
-        "provider": provider,
+    # hash a sorted copy so the hashes ignore data source order without reordering the caller's list
+    sorted_data_sources = sorted(data_sources, key=lambda x: x["id"])
+    # each field is serialized once and shared by its own hash and the core and full hashes
+    encoded_core_details = {
+        "instructions": to_canonical_json(instructions),
+        "disclaimer": to_canonical_json(disclaimer),
+        "dataSources": to_canonical_json(sorted_data_sources),
+        "tools": to_canonical_json(tools),
+        "provider": to_canonical_json(provider),
     }
     # Create a sha256 of the core details to use as a hash
     # This will be used to check if the assistant already exists
     # and to check if the assistant has been updated
-    core_sha256 = hashlib.sha256(
-        json.dumps(core_details, sort_keys=True, cls=CustomPydanticJSONEncoder).encode()
-    ).hexdigest()
-    datasources_sha256 = hashlib.sha256(
-        json.dumps(
-            data_sources.sort(key=lambda x: x["id"]), cls=CustomPydanticJSONEncoder
-        ).encode()
-    ).hexdigest()
-    instructions_sha256 = hashlib.sha256(
-        json.dumps(instructions, sort_keys=True, cls=CustomPydanticJSONEncoder).encode()
-    ).hexdigest()
-    disclaimer_sha256 = hashlib.sha256(
-        json.dumps(disclaimer, sort_keys=True, cls=CustomPydanticJSONEncoder).encode()
-    ).hexdigest()
-    core_details["assistant"] = assistant_name
-    core_details["description"] = description
-    full_sha256 = hashlib.sha256(
-        json.dumps(core_details, sort_keys=True, cls=CustomPydanticJSONEncoder).encode()
-    ).hexdigest()
+    core_sha256 = sha256_of_json_fields(encoded_core_details)
+    datasources_sha256 = sha256_of_text(encoded_core_details["dataSources"])
+    instructions_sha256 = sha256_of_text(encoded_core_details["instructions"])
+    disclaimer_sha256 = sha256_of_text(encoded_core_details["disclaimer"])
+    encoded_core_details["assistant"] = to_canonical_json(assistant_name)
+    encoded_core_details["description"] = to_canonical_json(description)
+    full_sha256 = sha256_of_json_fields(encoded_core_details)
     return (
         core_sha256,
         datasources_sha256,
@@ -1610,11 +1747,9 @@ def alias_key_of_type(assistant_public_id, alias_type):
     return f"{assistant_public_id}?type={alias_type}"
 
 
-def create_assistant_alias(user, assistant_public_id, database_id, version, alias_type):
-    dynamodb = boto3.resource("dynamodb")
-    alias_table = dynamodb.Table(os.environ["ASSISTANTS_ALIASES_DYNAMODB_TABLE"])
+def assistant_alias_item(user, assistant_public_id, database_id, version, alias_type):
     timestamp = time.strftime("%Y-%m-%dT%H:%M:%S")
-    new_item = {
+    return {
         "assistantId": alias_key_of_type(assistant_public_id, alias_type),
         "user": user,
         "createdAt": timestamp,
@@ -1623,53 +1758,68 @@ def create_assistant_alias(user, assistant_public_id, database_id, version, alia
         "currentVersion": version,
         "data": {"id": database_id},
     }
-    alias_table.put_item(Item=new_item)
+
+
+def create_assistant_alias(user, assistant_public_id, database_id, version, alias_type):
+    # runs on the share worker threads, the low level client is thread safe where the table resource is not
+    serializer = TypeSerializer()
+    alias_item = assistant_alias_item(
+        user, assistant_public_id, database_id, version, alias_type
+    )
+    dynamodb_client.put_item(
+        TableName=aliases_table.name,
+        Item={k: serializer.serialize(v) for k, v in alias_item.items()},
+    )
 
 
 def update_assistant_latest_alias(assistant_public_id, new_id, version):
-    update_assistant_alias_by_type(assistant_public_id, new_id, version, "latest")
+    return update_assistant_alias_by_type(assistant_public_id, new_id, version, "latest")
 
 
 def update_assistant_published_alias(assistant_public_id, new_id, version):
-    update_assistant_alias_by_type(
+    return update_assistant_alias_by_type(
         assistant_public_id, new_id, version, "latest_published"
     )
 
 
 def update_assistant_alias_by_type(assistant_public_id, new_id, version, alias_type):
     try:
-        dynamodb = boto3.resource("dynamodb")
-        alias_table = dynamodb.Table(os.environ["ASSISTANTS_ALIASES_DYNAMODB_TABLE"])
-
         alias_key = alias_key_of_type(assistant_public_id, alias_type)
 
         # Find all current entries for assistantId (hash) across all users (range) where version = "latest"
-        response = alias_table.query(
+        items = query_all_items(
+            aliases_table,
             IndexName="AssistantIdIndex",
             KeyConditionExpression=boto3.dynamodb.conditions.Key("assistantId").eq(
                 alias_key
             ),
+            # only the fields carried over into the rewritten alias
+            ProjectionExpression="#user, createdAt, aliasTo",
+            ExpressionAttributeNames={"#user": "user"},
         )
 
-        for item in response["Items"]:
-            try:
-                print(f"Updating assistant alias: {item}")
-                timestamp = time.strftime("%Y-%m-%dT%H:%M:%S")
-                updated_item = {
-                    "assistantId": alias_key,
-                    "user": item["user"],
-                    "updatedAt": timestamp,
-                    "createdAt": item["createdAt"],
-                    "currentVersion": version,
-                    "aliasTo": item["aliasTo"],
-                    "data": {"id": new_id},
-                }
-                alias_table.put_item(Item=updated_item)
-                print(f"Updated assistant alias: {updated_item}")
-            except ClientError as e:
-                print(f"Error updating assistant alias: {e}")
+        timestamp = time.strftime("%Y-%m-%dT%H:%M:%S")
+        updated = 0
+        # every user's alias gets the same rewrite, so send them 25 at a time
+        with aliases_table.batch_writer() as batch:
+            for item in items:
+                batch.put_item(
+                    Item={
+                        "assistantId": alias_key,
+                        "user": item["user"],
+                        "updatedAt": timestamp,
+                        "createdAt": item["createdAt"],
+                        "currentVersion": version,
+                        "aliasTo": item["aliasTo"],
+                        "data": {"id": new_id},
+                    }
+                )
+                updated += 1
+        print(f"Updated {updated} {alias_type} aliases of {assistant_public_id} to {new_id}")
+        return {"success": True, "message": f"Updated {updated} assistant aliases"}
     except ClientError as e:
         print(f"Error updating assistant alias: {e}")
+        return {"success": False, "message": "Failed to update assistant aliases"}
 
 
 
@@ -1678,10 +1828,6 @@ def request_assistant_to_public_ast(event, context, current_user, name, data):
     data = data["data"]
     assistant_id = data["assistantId"]
 
-    dynamodb = boto3.resource("dynamodb")
-    assistants_table = dynamodb.Table(os.environ["ASSISTANTS_DYNAMODB_TABLE"])
-    object_access_table = dynamodb.Table(os.environ.get("OBJECT_ACCESS_DYNAMODB_TABLE"))
-
     try:
         # First, find the current version of the assistant
         print("Looking up assistant: ", assistant_id)
@@ -1702,6 +1848,24 @@ def request_assistant_to_public_ast(event, context, current_user, name, data):
                 "message": f"Assistant is not available for public request: {assistant_id}",
             }
 
+        data_sources = get_data_source_keys(existing_assistant["dataSources"])
+        print("Updating permissions for ast datasources")
+        # grant the data sources first so a failed batch never leaves a usable assistant grant behind
+        with object_access_table.batch_writer(
+            overwrite_by_pkeys=["object_id", "principal_id"]
+        ) as batch:
+            for ds in data_sources:
+                batch.put_item(
+                    Item={
+                        "object_id": ds,
+                        "principal_id": current_user,
+                        "principal_type": "user",
+                        "object_type": "datasource",
+                        "permission_level": "read",
+                        "policy": None,
+                    }
+                )
+
         print("Updating assistant permissions for user: ", current_user)
         object_access_table.put_item(
             Item={
@@ -1714,21 +1878,6 @@ def request_assistant_to_public_ast(event, context, current_user, name, data):
             }
         )
 
-        data_sources = get_data_source_keys(existing_assistant["dataSources"])
-        print("Updating permissions for ast datasources")
-
-        for ds in data_sources:
-            object_access_table.put_item(
-                Item={
-                    "object_id": ds,
-                    "principal_id": current_user,
-                    "principal_type": "user",
-                    "object_type": "datasource",
-                    "permission_level": "read",
-                    "policy": None,
-                }
-            )
-
         print(f"Creating alias for user {current_user} for assistant {assistant_id}")
         create_assistant_alias(
             current_user,
@@ -1757,13 +1906,10 @@ def validate_assistant_id(event, context, current_user, name, data):
     data = data["data"]
     assistant_id = data["assistantId"]
 
-    dynamodb = boto3.resource("dynamodb")
-    assistants_table = dynamodb.Table(os.environ["ASSISTANTS_DYNAMODB_TABLE"])
-
     try:
         # First, find the current version of the assistant
         existing_assistant = get_most_recent_assistant_version(
-            assistants_table, assistant_id
+            assistants_table, assistant_id, use_cache=True
         )
 
         if not existing_assistant:
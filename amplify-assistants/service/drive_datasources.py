@@ -2,14 +2,12 @@
 # Authors: Jules White, Allen Karns, Karely Rodriguez, Max Moundas
 
 import os
-import boto3
 import json
 import requests
 from pycommon.const import APIAccessType
 
-# Initialize AWS services
-dynamodb = boto3.resource("dynamodb")
-s3 = boto3.client("s3")
+# shared with core so it carries its retry and connection pool config
+from service.core import assistants_table
 
 
 from pycommon.api.ops import api_tool
@@ -21,7 +19,7 @@ from schemata.permissions import get_permission_checker
 setup_validated(rules, get_permission_checker)
 add_api_access_types([APIAccessType.ASSISTANTS.value, APIAccessType.SHARE.value])
 
-from service.core import get_most_recent_assistant_version
+from service.core import get_most_recent_assistant_version, cached_assistants, cached_latest_assistants
 
 
 def process_assistant_drive_sources(assistant_data, access_token):
@@ -239,8 +237,6 @@ def process_drive_sources(event, context, current_user, name, data=None):
     """
     access_token = data["access_token"]
     try:
-        assistants_table = dynamodb.Table(os.environ["ASSISTANTS_DYNAMODB_TABLE"])
-        
         # Get assistantId from request data
         assistant_public_id = data["data"]["assistantId"]
         
@@ -285,6 +281,8 @@ def process_drive_sources(event, context, current_user, name, data=None):
                 ExpressionAttributeNames=expression_attribute_names,
                 ExpressionAttributeValues=expression_attribute_values
             )
+            cached_assistants.pop(latest_assistant["id"], None)
+            cached_latest_assistants.pop(latest_assistant.get("assistantId"), None)
         
         return {
             "success": True,
@@ -4,15 +4,13 @@
 from datetime import datetime
 import os
 import re
-import boto3
 import json
 from boto3.dynamodb.conditions import Key
 from botocore.exceptions import ClientError
 from pycommon.const import APIAccessType
 
-# Initialize AWS services
-dynamodb = boto3.resource("dynamodb")
-s3 = boto3.client("s3")
+# Initialize AWS services, shared with core so they carry its retry and connection pool config
+from service.core import dynamodb, s3
 
 from pycommon.authz import validated, setup_validated, add_api_access_types
 from schemata.schema_validation_rules import rules
@@ -48,10 +46,9 @@ def retrieve_astg_for_system_use(event, context, current_user, name, data):
             }
         )
     print("retrieving astgp data")
-    dynamodb = boto3.resource("dynamodb")
     assistants_table = dynamodb.Table(os.environ["ASSISTANTS_DYNAMODB_TABLE"])
 
-    astgp = get_most_recent_assistant_version(assistants_table, assistantId)
+    astgp = get_most_recent_assistant_version(assistants_table, assistantId, use_cache=True)
     if not astgp:
         return json.dumps(
             {
@@ -143,7 +140,6 @@ def get_group_assistant_conversations(event, context, current_user, name, data):
 
     assistant_id = data["data"]["assistantId"]
 
-    dynamodb = boto3.resource("dynamodb")
     table = dynamodb.Table(os.environ["GROUP_ASSISTANT_CONVERSATIONS_DYNAMO_TABLE"])
 
     try:
@@ -198,7 +194,6 @@ def get_group_conversations_data(event, context, current_user, name, data):
     conversation_id = data["data"]["conversationId"]
     assistant_id = data["data"]["assistantId"]
 
-    s3 = boto3.client("s3")
     bucket_name = os.environ["S3_GROUP_ASSISTANT_CONVERSATIONS_BUCKET_NAME"]
     key = f"{assistant_id}/{conversation_id}.txt"
 
@@ -244,7 +239,6 @@ def get_group_assistant_dashboards(event, context, current_user, name, data):
     include_conversation_data = data["data"].get("includeConversationData", False)
     include_conversation_content = data["data"].get("includeConversationContent", False)
 
-    dynamodb = boto3.resource("dynamodb")
     table = dynamodb.Table(os.environ["GROUP_ASSISTANT_CONVERSATIONS_DYNAMO_TABLE"])
     # table = dynamodb.Table("group-assistant-conversations-content-test")
 
@@ -358,7 +352,6 @@ def get_group_assistant_dashboards(event, context, current_user, name, data):
         response_data = {"dashboardData": dashboard_data}
 
         if include_conversation_data or include_conversation_content:
-            s3 = boto3.client("s3")
             bucket_name = os.environ["S3_GROUP_ASSISTANT_CONVERSATIONS_BUCKET_NAME"]
 
             for conv in conversations:
@@ -437,7 +430,6 @@ def save_user_rating(event, context, current_user, name, data):
     user_rating = data["data"]["userRating"]
     user_feedback = data["data"].get("userFeedback")  # Get userFeedback if present
 
-    dynamodb = boto3.resource("dynamodb")
     table = dynamodb.Table(os.environ["GROUP_ASSISTANT_CONVERSATIONS_DYNAMO_TABLE"])
 
     try:
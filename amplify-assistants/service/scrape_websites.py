@@ -2,9 +2,7 @@
 # Authors: Jules White, Allen Karns, Karely Rodriguez, Max Moundas
 
 from datetime import datetime, timedelta
-import os
 import re
-import boto3
 import json
 import requests
 import xmltodict
@@ -14,9 +12,8 @@ from pycommon.const import APIAccessType
 from pycommon.api.files import upload_file, delete_file
 from pycommon.encoders import SmartDecimalEncoder
 
-# Initialize AWS services
-dynamodb = boto3.resource("dynamodb")
-s3 = boto3.client("s3")
+# shared with core so it carries its retry and connection pool config
+from service.core import assistants_table
 
 from pycommon.api.ops import api_tool
 from pycommon.authz import validated, setup_validated, add_api_access_types
@@ -27,7 +24,7 @@ setup_validated(rules, get_permission_checker)
 add_api_access_types([APIAccessType.ASSISTANTS.value])
 
 
-from service.core import get_most_recent_assistant_version
+from service.core import get_most_recent_assistant_version, cached_assistants, cached_latest_assistants
 
 def sanitize_and_validate_url(url):
     """
@@ -462,8 +459,6 @@ def rescan_websites(event, context, current_user, name, data=None):
     """
     access_token = data["access_token"]
     try:
-        assistants_table = dynamodb.Table(os.environ["ASSISTANTS_DYNAMODB_TABLE"])
-
         # Get assistantId (public ID) from request data
         assistant_public_id = data["data"]["assistantId"]
         
@@ -714,7 +709,6 @@ def process_assistant_websites(assistant, access_token):
         final_data_sources = non_web_data_sources + kept_web_ds + scraped_ds
 
         # Update assistant with new data sources and updated website URLs
-        assistants_table = dynamodb.Table(os.environ["ASSISTANTS_DYNAMODB_TABLE"])
         assistants_table.update_item(
             Key={"id": assistant["id"]},
             UpdateExpression="SET dataSources = :ds, #data.websiteUrls = :urls",
@@ -724,6 +718,8 @@ def process_assistant_websites(assistant, access_token):
                 ":urls": updated_website_urls,
             },
         )
+        cached_assistants.pop(assistant["id"], None)
+        cached_latest_assistants.pop(assistant.get("assistantId"), None)
 
         return {
             "success": True,
@@ -3,15 +3,13 @@
 
 from datetime import datetime
 import os
-import boto3
 import json
 from boto3.dynamodb.conditions import Key
 from pycommon.const import APIAccessType
 from pycommon.api.amplify_users import are_valid_amplify_users
 
-# Initialize AWS services
-dynamodb = boto3.resource("dynamodb")
-s3 = boto3.client("s3")
+# Initialize AWS services, shared with core so they carry its retry and connection pool config
+from service.core import dynamodb
 
 
 from pycommon.api.amplify_groups import (
@@ -29,7 +27,7 @@ add_api_access_types([APIAccessType.ASSISTANTS.value])
 
 from pycommon.encoders import CustomPydanticJSONEncoder
 
-from service.core import check_user_can_update_assistant, get_most_recent_assistant_version, is_group_sys_user, save_assistant, update_assistant_latest_alias
+from service.core import check_can_do, get_most_recent_assistant_version, is_group_sys_user, save_assistant, update_assistant_latest_alias
 
 @api_tool(
     path="/assistant/lookup",
@@ -137,7 +135,6 @@ def lookup_assistant_path(event, context, current_user, name, data):
         print(f"Using lowercase path for lookup: '{ast_path}'")
 
         # Get DynamoDB resource
-        dynamodb = boto3.resource("dynamodb")
         lookup_table = dynamodb.Table(os.environ.get("ASSISTANT_LOOKUP_DYNAMODB_TABLE"))
 
         # Print the table name for debugging
@@ -231,7 +228,7 @@ def lookup_assistant_path(event, context, current_user, name, data):
         assistant_id = item.get("assistantId")
         assistants_table = dynamodb.Table(os.environ["ASSISTANTS_DYNAMODB_TABLE"])
         assistant_definition = get_most_recent_assistant_version(
-            assistants_table, assistant_id
+            assistants_table, assistant_id, use_cache=True
         )
 
         group_id = assistant_definition.get("data", {}).get("groupId", None)
@@ -396,7 +393,6 @@ def add_assistant_path(event, context, current_user, name, data):
     print(f"Adding path '{ast_path}' to assistant '{assistant_id}'")
 
     # Get DynamoDB resources
-    dynamodb = boto3.resource("dynamodb")
     assistants_table = dynamodb.Table(os.environ["ASSISTANTS_DYNAMODB_TABLE"])
     lookup_table = dynamodb.Table(os.environ.get("ASSISTANT_LOOKUP_DYNAMODB_TABLE"))
 
@@ -413,7 +409,7 @@ def add_assistant_path(event, context, current_user, name, data):
             }
 
         # Check if the user has permission to update this assistant
-        if not check_user_can_update_assistant(existing_assistant, current_user):
+        if not check_can_do(existing_assistant, current_user):
             return {
                 "success": False,
                 "message": "You do not have permission to update this assistant.",
@@ -556,7 +552,8 @@ def add_assistant_path(event, context, current_user, name, data):
             print(f"Error adding permissions for assistant version: {str(e)}")
 
         # Update the latest alias to point to the new version
-        update_assistant_latest_alias(assistant_id, new_item["id"], new_version)
+        if not update_assistant_latest_alias(assistant_id, new_item["id"], new_version)["success"]:
+            print(f"Error pointing the latest alias of {assistant_id} at {new_item['id']}")
 
         # Now that we've successfully saved the new path, remove ALL previous paths for this assistant except the new one
         try:
@@ -612,7 +609,6 @@ def release_assistant_path(ast_path, assistant_id, current_user):
     if not ast_path or not assistant_id:
         print("No ast_path or assistant_id provided... no action taken")
         return
-    dynamodb = boto3.resource("dynamodb")
     lookup_table = dynamodb.Table(os.environ.get("ASSISTANT_LOOKUP_DYNAMODB_TABLE"))
 
     try: